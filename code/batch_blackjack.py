@@ -0,0 +1,249 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+Batch evaluation of an entire Blackjack shoe.
+
+The object-based :class:`BlackjackGame` deals :class:`blackjack.Card` instances
+into :class:`Hand` objects and asks a :class:`BlackjackPlayer` for decisions.
+The :func:`playShoe` function plays the same rules and the same strategy
+table in one loop over an :class:`array.array` of card values,
+with no per-card or per-hand objects.
+Each function produces the net result of each round.
+
+Rules: one hand per round for one unit, the dealer peeks for blackjack,
+stands on all 17's, blackjack pays 3:2, doubling is on the first two
+cards only, and there are no splits: a pair is played as a hard total.
+
+>>> import random
+>>> from shoe_counter import CountingShoe
+>>> shoe = CountingShoe(decks=6, rng=random.Random(42))
+>>> shoe.shuffle()
+>>> values = encode(shoe.cards)
+>>> len(values), values[:8].tolist()
+(312, [6, 10, 3, 7, 9, 10, 3, 3])
+>>> results = playShoe(values, cut=260, table=BASIC)
+>>> game = BlackjackGame(shoe.cards, cut=260, player=BlackjackPlayer(BASIC))
+>>> results.tolist() == [game.cycle() for _ in game.rounds()]
+True
+"""
+from array import array
+from typing import Iterable, Iterator, List, Sequence
+
+from blackjack import Card
+
+STAND, HIT, DOUBLE = 0, 1, 2
+
+#: The most cards one round can use. The player draws while the hard total
+#: is at most 21, so 22 cards at the most, all Aces; the dealer draws
+#: while the total is under 17, so 17 cards at the most.
+ROUND_CARDS = 22 + 17
+
+
+class StrategyTable:
+    """
+    Decisions indexed by ``[total][up]``, where ``up`` is the dealer's
+    up card value, 1 (Ace) to 10.
+    A table is built from rows like ``"HDDDDHHHHH"``, for the up cards
+    2 to 10 and then Ace.
+
+    >>> BASIC.hard[11][6], BASIC.soft[18][10]
+    (2, 1)
+    """
+
+    codes = {"S": STAND, "H": HIT, "D": DOUBLE}
+
+    def __init__(self, hard: dict, soft: dict) -> None:
+        self.hard = self._build(hard, default=STAND)
+        self.soft = self._build(soft, default=STAND)
+
+    def _build(self, rows: dict, default: int) -> List[List[int]]:
+        table = [[default] * 11 for _ in range(22)]
+        for total, row in rows.items():
+            assert len(row) == 10, f"{total}: {row!r}"
+            for up, code in zip(range(2, 12), row):
+                table[total][up if up <= 10 else 1] = self.codes[code]
+        return table
+
+
+BASIC = StrategyTable(
+    hard={
+        **{t: "HHHHHHHHHH" for t in range(4, 9)},
+        9: "HDDDDHHHHH",
+        10: "DDDDDDDDHH",
+        11: "DDDDDDDDDH",
+        12: "HHSSSHHHHH",
+        **{t: "SSSSSHHHHH" for t in range(13, 17)},
+    },
+    soft={
+        12: "HHHHHHHHHH",
+        13: "HHHDDHHHHH",
+        14: "HHHDDHHHHH",
+        15: "HHDDDHHHHH",
+        16: "HHDDDHHHHH",
+        17: "HDDDDHHHHH",
+        18: "SDDDDSSHHH",
+    },
+)
+
+
+def encode(cards: Iterable[Card]) -> array:
+    """The blackjack values of the cards, 1 (Ace) to 10."""
+    return array("b", (c.hardValue for c in cards))
+
+
+def playShoe(values: Sequence[int], cut: int, table: StrategyTable) -> array:
+    """
+    Play rounds from the start of the shoe until the cut card is reached,
+    or until fewer than :data:`ROUND_CARDS` cards are left.
+    Return the net result of each round.
+    """
+    hard_table, soft_table = table.hard, table.soft
+    results = array("d")
+    append = results.append
+    i = 0
+    end = min(cut, len(values) - ROUND_CARDS + 1)
+    while i < end:
+        p1, up, p2, hole = values[i], values[i + 1], values[i + 2], values[i + 3]
+        i += 4
+        hard = p1 + p2
+        aces = p1 == 1 or p2 == 1
+        dealer_bj = up + hole == 11 and (up == 1 or hole == 1)
+        if hard == 11 and aces:
+            append(0.0 if dealer_bj else 1.5)
+            continue
+        if dealer_bj:
+            append(-1.0)
+            continue
+        bet = 1.0
+        cards = 2
+        while True:
+            if aces and hard <= 11:
+                action = soft_table[hard + 10][up]
+            else:
+                action = hard_table[hard][up] if hard <= 21 else STAND
+            if action == STAND:
+                break
+            hard += values[i]
+            aces = aces or values[i] == 1
+            i += 1
+            if action == DOUBLE and cards == 2:
+                bet = 2.0
+                break
+            cards += 1
+        total = hard + 10 if aces and hard <= 11 else hard
+        if total > 21:
+            append(-bet)
+            continue
+        d_hard = up + hole
+        d_aces = up == 1 or hole == 1
+        d_total = d_hard + 10 if d_aces and d_hard <= 11 else d_hard
+        while d_total < 17:
+            d_hard += values[i]
+            d_aces = d_aces or values[i] == 1
+            i += 1
+            d_total = d_hard + 10 if d_aces and d_hard <= 11 else d_hard
+        if d_total > 21 or total > d_total:
+            append(bet)
+        elif total < d_total:
+            append(-bet)
+        else:
+            append(0.0)
+    return results
+
+
+class Hand:
+    """The cards in a hand, with hard and soft totals."""
+
+    def __init__(self, *cards: Card) -> None:
+        self.cards = list(cards)
+
+    def add(self, card: Card) -> None:
+        self.cards.append(card)
+
+    def hard(self) -> int:
+        return sum(c.hardValue for c in self.cards)
+
+    def soft(self) -> bool:
+        """True if an ace is being counted as 11."""
+        return any(c.hardValue == 1 for c in self.cards) and self.hard() <= 11
+
+    def value(self) -> int:
+        return self.hard() + 10 if self.soft() else self.hard()
+
+    def size(self) -> int:
+        return len(self.cards)
+
+    def blackjack(self) -> bool:
+        return self.size() == 2 and self.value() == 21
+
+    def busted(self) -> bool:
+        return self.value() > 21
+
+    def getUpCard(self) -> Card:
+        return self.cards[0]
+
+
+class BlackjackPlayer:
+    """Plays one :class:`Hand` using a :class:`StrategyTable`."""
+
+    def __init__(self, table: StrategyTable) -> None:
+        self.table = table
+
+    def action(self, hand: Hand, up: Card) -> int:
+        if hand.busted():
+            return STAND
+        rows = self.table.soft if hand.soft() else self.table.hard
+        return rows[hand.value()][up.hardValue]
+
+    def doubleDown(self, hand: Hand, up: Card) -> bool:
+        return hand.size() == 2 and self.action(hand, up) == DOUBLE
+
+    def hit(self, hand: Hand, up: Card) -> bool:
+        return self.action(hand, up) != STAND
+
+
+class BlackjackGame:
+    """The object-based game, dealing :class:`Card` instances from a list."""
+
+    def __init__(self, cards: List[Card], cut: int, player: BlackjackPlayer) -> None:
+        self.cards = cards
+        self.cut = cut
+        self.player = player
+        self.position = 0
+
+    def rounds(self) -> Iterator[int]:
+        """Yield once for each round to play before the cut card, with :data:`ROUND_CARDS` cards left."""
+        self.position = 0
+        end = min(self.cut, len(self.cards) - ROUND_CARDS + 1)
+        while self.position < end:
+            yield self.position
+
+    def deal(self) -> Card:
+        card = self.cards[self.position]
+        self.position += 1
+        return card
+
+    def cycle(self) -> float:
+        """Play one round, return the player's net result."""
+        p1, up, p2, hole = self.deal(), self.deal(), self.deal(), self.deal()
+        hand, dealer = Hand(p1, p2), Hand(up, hole)
+        if hand.blackjack():
+            return 0.0 if dealer.blackjack() else 1.5
+        if dealer.blackjack():
+            return -1.0
+        bet = 1.0
+        if self.player.doubleDown(hand, up):
+            bet = 2.0
+            hand.add(self.deal())
+        else:
+            while self.player.hit(hand, up):
+                hand.add(self.deal())
+        if hand.busted():
+            return -bet
+        while dealer.value() < 17:
+            dealer.add(self.deal())
+        if dealer.busted() or hand.value() > dealer.value():
+            return bet
+        if hand.value() < dealer.value():
+            return -bet
+        return 0.0
@@ -0,0 +1,323 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+End-to-end benchmarks for the three games.
+
+Each scenario runs whole sessions, each with its own
+:class:`counter_rng.PhiloxRandom` stream, so the work is the same
+on every run and on any number of workers.
+
+``roulette``
+    The :class:`roulette.Martingale` player on a :class:`roulette.Simulator`.
+
+``craps``
+    The :class:`craps.PassLineOdds` player, with double odds.
+
+``craps-fraction``
+    The same sessions, with each payout computed by :class:`craps.FractionBet`
+    as a :class:`fractions.Fraction`, for comparison with fixed-point cents.
+
+``blackjack``
+    Basic strategy over a six-deck shoe with :func:`batch_blackjack.playShoe`;
+    a session is one shoe, a cycle is one round.
+
+>>> for name, scenario in SCENARIOS.items():
+...     print(name, scenario(0, 10, 42, None))
+roulette (10, 773)
+craps (10, 2233)
+craps-fraction (10, 2233)
+blackjack (10, 482)
+
+The report has sessions and cycles per second, the peak resident set size,
+and the scaling efficiency from 1 to N worker processes:
+the rate with N workers divided by N times the rate with one.
+Workers are processes by default. With ``--backend thread`` they're threads
+in this process, sharing one set of prebuilt layouts (the wheel's bins and the
+dice's throws) and the strategy tables; each thread has its own games, players,
+and random number generators. Threads run in parallel only on a free-threaded
+build of CPython, where :func:`sys._is_gil_enabled` is false. With ``auto``,
+the backend is threads on a free-threaded build, and processes otherwise.
+The memory for a run, ``pss_kib``, is the peak proportional set size of
+this process and its worker processes during the run, less this process's
+at the start. Proportional set size charges each shared page to the processes
+that share it, so a forked worker's copy-on-write pages aren't counted twice.
+It's ``None`` where ``/proc/<pid>/smaps_rollup`` isn't available.
+
+A report can be compared with a stored baseline::
+
+    python benchmark.py --sessions 2000 --workers 4 --output baseline.json
+    python benchmark.py --sessions 2000 --workers 4 --baseline baseline.json
+    python benchmark.py --sessions 2000 --workers 4 --backend process --backend thread
+"""
+import argparse
+from functools import partial
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Protocol, Sequence, Tuple, Type
+
+from batch_blackjack import BASIC, encode, playShoe
+from counter_rng import PhiloxRandom
+from distributed import PROCESS, THREAD, runLocal
+import craps
+from layout_snapshot import Layouts, build
+import roulette
+from shoe_counter import CountingShoe
+
+AUTO = "auto"
+
+
+class Scenario(Protocol):
+    """Run sessions ``first`` to ``last - 1``; return the sessions and cycles."""
+
+    def __call__(self, first: int, last: int, seed: int, layouts: Optional[Layouts] = None) -> Tuple[int, int]:
+        ...
+
+
+def rouletteMartingale(first: int, last: int, seed: int, layouts: Optional[Layouts] = None) -> Tuple[int, int]:
+    """:returns: sessions and cycles."""
+    table = roulette.Table(limit=300, minimum=1)
+    wheel = (layouts or build()).wheel()
+    sim = roulette.Simulator(roulette.Game(wheel, table), roulette.Martingale(table))
+    base, cycles = PhiloxRandom(seed), 0
+    for number in range(first, last):
+        wheel.rng = base.stream(number)
+        cycles += len(sim.session())
+    return last - first, cycles
+
+
+def crapsPassLineOdds(
+    first: int, last: int, seed: int, layouts: Optional[Layouts] = None, bet: Type[craps.Bet] = craps.Bet
+) -> Tuple[int, int]:
+    table = craps.Table(limit=craps.cents(300), minimum=craps.cents(5))
+    game = craps.CrapsGame((layouts or build()).dice(), table)
+    player = craps.PassLineOdds(table, craps.cents(5), multiple=2, bet=bet)
+    sim = roulette.Simulator(game, player, initStake=craps.cents(100))
+    base, cycles = PhiloxRandom(seed), 0
+    for number in range(first, last):
+        game.dice.rng = base.stream(number)
+        cycles += len(sim.session())
+    return last - first, cycles
+
+
+def crapsFraction(first: int, last: int, seed: int, layouts: Optional[Layouts] = None) -> Tuple[int, int]:
+    return crapsPassLineOdds(first, last, seed, layouts, bet=craps.FractionBet)
+
+
+def blackjackBasic(first: int, last: int, seed: int, layouts: Optional[Layouts] = None) -> Tuple[int, int]:
+    base, cycles = PhiloxRandom(seed), 0
+    for number in range(first, last):
+        shoe = CountingShoe(decks=6, rng=base.stream(number))
+        shoe.shuffle()
+        cycles += len(playShoe(encode(shoe.cards), cut=260, table=BASIC))
+    return last - first, cycles
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "roulette": rouletteMartingale,
+    "craps": crapsPassLineOdds,
+    "craps-fraction": crapsFraction,
+    "blackjack": blackjackBasic,
+}
+
+
+def freeThreaded() -> bool:
+    """True on a CPython build running without the GIL."""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def _maxRSS(who: int) -> int:
+    """Peak resident set size in KiB."""
+    scale = 1024 if sys.platform == "darwin" else 1  # macOS reports bytes
+    return resource.getrusage(who).ru_maxrss // scale
+
+
+def peakRSS() -> int:
+    """Peak resident set size in KiB, of this process or its largest worker."""
+    return max(_maxRSS(resource.RUSAGE_SELF), _maxRSS(resource.RUSAGE_CHILDREN))
+
+
+def pss(pid: int = 0) -> Optional[int]:
+    """Proportional set size in KiB, of this process or ``pid``; ``None`` if it isn't available."""
+    try:
+        with open(f"/proc/{pid or 'self'}/smaps_rollup") as rollup:
+            for line in rollup:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class MemorySampler:
+    """
+    The peak proportional set size of this process and its children
+    during a ``with`` statement, less this process's at the start.
+    The sampling thread wakes every ``interval`` seconds; it's coarse,
+    so that it takes almost no time from a thread backend's workers.
+    """
+
+    def __init__(self, interval: float = 0.25) -> None:
+        self.interval = interval
+        self.base: Optional[int] = None
+        self.peak: Optional[int] = None
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "MemorySampler":
+        self.base = self.peak = pss()
+        if self.base is not None:
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        if self.base is not None:
+            self.stop.set()
+            self.thread.join()
+            self.sample()
+
+    def _run(self) -> None:
+        while not self.stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        children = [child.pid for child in multiprocessing.active_children() if child.pid]
+        sizes = [pss()] + [pss(pid) for pid in children]
+        total = sum(size for size in sizes if size is not None)
+        self.peak = max(self.peak or 0, total)
+
+    @property
+    def used(self) -> Optional[int]:
+        return None if self.base is None or self.peak is None else self.peak - self.base
+
+
+def measure(
+    name: str, sessions: int, workers: int = 1, seed: int = 42, batch: int = 0, backend: str = PROCESS
+) -> Dict[str, Any]:
+    """
+    Run ``sessions`` sessions of a scenario with ``workers`` workers,
+    using :func:`distributed.runLocal`.
+    The threads share one :class:`layout_snapshot.Layouts`.
+    Either way, the sessions are the same.
+
+    >>> threads = measure("craps", 20, workers=2, backend=THREAD)
+    >>> threads["backend"], threads["cycles"] == measure("craps", 20)["cycles"]
+    ('thread', True)
+    """
+    if backend == AUTO:
+        backend = THREAD if freeThreaded() else PROCESS
+    scenario = SCENARIOS[name]
+    with MemorySampler() as memory:
+        start = time.perf_counter()
+        job = partial(scenario, layouts=build() if backend == THREAD else None)
+        results = runLocal(job, sessions, seed, workers, batch, backend)
+        seconds = time.perf_counter() - start
+    cycles = sum(c for _, c in results)
+    return {
+        "backend": backend,
+        "workers": workers,
+        "sessions": sessions,
+        "cycles": cycles,
+        "seconds": round(seconds, 4),
+        "sessions_per_sec": round(sessions / seconds, 1),
+        "cycles_per_sec": round(cycles / seconds, 1),
+        "pss_kib": memory.used,
+    }
+
+
+def run(
+    names: List[str], sessions: int, workers: int = 1, seed: int = 42, backends: Sequence[str] = (PROCESS,)
+) -> Dict[str, Any]:
+    """
+    Measure each scenario with 1 to ``workers`` workers of each backend.
+    The efficiency of each row is relative to one worker of the same backend.
+    The top-level rates are for one worker of the first backend.
+    """
+    report: Dict[str, Any] = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "free_threaded": freeThreaded(),
+        "scenarios": {},
+    }
+    for name in names:
+        scaling = []
+        for backend in backends:
+            rows = [measure(name, sessions, n, seed, backend=backend) for n in range(1, workers + 1)]
+            single = rows[0]["sessions_per_sec"]
+            for row in rows:
+                row["efficiency"] = round(row["sessions_per_sec"] / (row["workers"] * single), 3)
+            scaling.extend(rows)
+        report["scenarios"][name] = {
+            "sessions": sessions,
+            "cycles": scaling[0]["cycles"],
+            "sessions_per_sec": scaling[0]["sessions_per_sec"],
+            "cycles_per_sec": scaling[0]["cycles_per_sec"],
+            "scaling": scaling,
+        }
+    report["peak_rss_kib"] = peakRSS()
+    return report
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.10) -> List[str]:
+    """
+    The rates in ``report`` that are more than ``tolerance`` below ``baseline``.
+
+    >>> base = {"scenarios": {"craps": {"sessions_per_sec": 100.0, "cycles_per_sec": 2000.0}}}
+    >>> new = {"scenarios": {"craps": {"sessions_per_sec": 85.0, "cycles_per_sec": 1900.0}}}
+    >>> compare(new, base)
+    ['craps sessions_per_sec: 85.0 is 15.0% below 100.0']
+    >>> compare(new, base, tolerance=0.2)
+    []
+    """
+    regressions = []
+    for name, old in baseline["scenarios"].items():
+        new = report["scenarios"].get(name)
+        if new is None:
+            continue
+        for metric in ("sessions_per_sec", "cycles_per_sec"):
+            change = new[metric] / old[metric] - 1
+            if change < -tolerance:
+                regressions.append(f"{name} {metric}: {new[metric]} is {-change:.1%} below {old[metric]}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument("scenarios", nargs="*", metavar="scenario", help=", ".join(SCENARIOS))
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", action="append", choices=[PROCESS, THREAD, AUTO], dest="backends")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="compare with this JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario {', '.join(sorted(unknown))}")
+    report = run(args.scenarios or list(SCENARIOS), args.sessions, args.workers, args.seed, args.backends or [PROCESS])
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as target:
+            target.write(text)
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline) as source:
+            regressions = compare(report, json.load(source), args.tolerance)
+        for line in regressions:
+            print(line, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())  # pragma: no cover
@@ -0,0 +1,285 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+Betting strategies as compiled state machines.
+
+A :class:`BettingStrategy` tracks the wins and losses of bets on one
+:class:`Outcome`, and computes the next bet amount. The Roulette players
+delegate to one; see :class:`roulette.StrategyPlayer`.
+
+Most systems have few states. The Martingale system's state is the number
+of losses; the 1-3-2-6 system's state is the number of wins. We can
+enumerate every reachable state once, below the table limit, and number them.
+A :class:`CompiledStrategy` is then three arrays indexed by state number:
+the bet amount, the next state after a win, and the next state after a loss.
+A transition is an array lookup; nothing is allocated.
+The state of a player is a single integer, easily saved and restored.
+
+>>> m = martingale(limit=300)
+>>> len(m), m.amounts.tolist()
+(10, [1, 2, 4, 8, 16, 32, 64, 128, 256, 512])
+>>> s = CompiledBetting(m, "Black")
+>>> for _ in range(3):
+...     s.lose(None)
+>>> s.amount(), s
+(8, BettingStrategy(martingale, Black, 8))
+>>> saved = s.snapshot()
+>>> s.win(None)
+>>> s.amount()
+1
+>>> s.restore(saved)
+>>> s.amount()
+8
+
+A bank of independent players can be advanced together, one array for the
+states and one byte for each player's result.
+
+>>> states = array("l", [0, 0, 3, 9])
+>>> m.advance(states, bytes([0, 1, 0, 0]))
+>>> states.tolist(), m.bets(states).tolist()
+([1, 0, 4, 9], [2, 1, 16, 512])
+
+The Cancellation system's state is a sequence of amounts. It has too many
+reachable states to enumerate, so :class:`CancellationBetting` keeps the
+sequence in a preallocated array, with two indices for its ends.
+"""
+from array import array
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, List, Sequence
+
+
+class CompiledStrategy:
+    """
+    The amount, next state on a win, and next state on a loss, for each state.
+    State 0 is the initial state. A state with an amount over the limit
+    is final: the player can't bet, so it never changes.
+    """
+
+    def __init__(self, name: str, labels: List[Hashable], amounts: array, onWin: array, onLose: array) -> None:
+        self.name = name
+        self.labels = labels
+        self.amounts = amounts
+        self.onWin = onWin
+        self.onLose = onLose
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def advance(self, states: array, won: bytes) -> None:
+        """Update each of ``states`` in place, for a win where ``won`` is non-zero."""
+        onWin, onLose = self.onWin, self.onLose
+        for i, w in enumerate(won):
+            states[i] = onWin[states[i]] if w else onLose[states[i]]
+
+    def bets(self, states: array) -> array:
+        """The bet amount for each of ``states``."""
+        amounts = self.amounts
+        return array("l", [amounts[s] for s in states])
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.name!r}, {len(self)} states)"
+
+
+def compileStrategy(
+    name: str,
+    initial: Hashable,
+    amount: Callable[[Any], int],
+    won: Callable[[Any], Hashable],
+    lost: Callable[[Any], Hashable],
+    limit: int,
+) -> CompiledStrategy:
+    """
+    Enumerate the states reachable from ``initial``, breadth first,
+    and build the transition tables. The state values can be anything
+    hashable; they're kept as :obj:`CompiledStrategy.labels`.
+
+    >>> c = compileStrategy("count", 0, lambda s: s + 1, lambda s: 0, lambda s: s + 1, limit=3)
+    >>> c.labels, c.onWin.tolist(), c.onLose.tolist()
+    ([0, 1, 2, 3], [0, 0, 0, 3], [1, 2, 3, 3])
+    """
+    numbers: Dict[Hashable, int] = {initial: 0}
+    labels: List[Hashable] = [initial]
+    amounts, onWin, onLose = array("l"), array("l"), array("l")
+    queue = deque([initial])
+    while queue:
+        state = queue.popleft()
+        number = numbers[state]
+        bet = amount(state)
+        amounts.append(bet)
+        if bet > limit:
+            onWin.append(number)
+            onLose.append(number)
+            continue
+        for successor, table in ((won(state), onWin), (lost(state), onLose)):
+            if successor not in numbers:
+                numbers[successor] = len(labels)
+                labels.append(successor)
+                queue.append(successor)
+            table.append(numbers[successor])
+    return CompiledStrategy(name, labels, amounts, onWin, onLose)
+
+
+@lru_cache(maxsize=None)
+def martingale(limit: int) -> CompiledStrategy:
+    """Double the bet after each loss; the state is the bet."""
+    return compileStrategy("martingale", 1, lambda b: b, lambda b: 1, lambda b: b * 2, limit)
+
+
+@lru_cache(maxsize=None)
+def oneThreeTwoSix(limit: int, unit: int = 1) -> CompiledStrategy:
+    """
+    Bet 1, 3, 2, then 6 units after successive wins; start over after a loss or the fourth win.
+
+    >>> c = oneThreeTwoSix(limit=300)
+    >>> c.amounts.tolist(), c.onWin.tolist(), c.onLose.tolist()
+    ([1, 3, 2, 6], [1, 2, 3, 0], [0, 0, 0, 0])
+    """
+    steps = (1, 3, 2, 6)
+    return compileStrategy("1-3-2-6", 0, lambda s: steps[s] * unit, lambda s: (s + 1) % 4, lambda s: 0, limit)
+
+
+@lru_cache(maxsize=None)
+def fibonacci(limit: int) -> CompiledStrategy:
+    """
+    Step forward in the Fibonacci sequence after a loss; start over after a win.
+    The state is the pair (recent, previous).
+
+    >>> fibonacci(limit=20).amounts.tolist()
+    [1, 1, 2, 3, 5, 8, 13, 21]
+    """
+    return compileStrategy(
+        "fibonacci", (1, 0), lambda s: s[0], lambda s: (1, 0), lambda s: (s[0] + s[1], s[0]), limit
+    )
+
+
+class BettingStrategy:
+    """
+    The bet amount for one :class:`Outcome`, with the state
+    changed by each :meth:`win` and :meth:`lose`.
+
+    :meth:`snapshot` returns the state as :class:`bytes`, for a checkpoint;
+    :meth:`restore` puts it back.
+    """
+
+    def __init__(self, outcome: Any) -> None:
+        self.outcome = outcome
+
+    def amount(self) -> int:
+        raise NotImplementedError
+
+    def win(self, bet: Any) -> None:
+        raise NotImplementedError
+
+    def lose(self, bet: Any) -> None:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        raise NotImplementedError
+
+    def snapshot(self) -> bytes:
+        raise NotImplementedError
+
+    def restore(self, snapshot: bytes) -> None:
+        raise NotImplementedError
+
+
+class CompiledBetting(BettingStrategy):
+    """A :class:`BettingStrategy` whose state is a state number of a :class:`CompiledStrategy`."""
+
+    def __init__(self, compiled: CompiledStrategy, outcome: Any) -> None:
+        super().__init__(outcome)
+        self.table = compiled
+        self.state = 0
+
+    def amount(self) -> int:
+        return self.table.amounts[self.state]
+
+    def win(self, bet: Any) -> None:
+        self.state = self.table.onWin[self.state]
+
+    def lose(self, bet: Any) -> None:
+        self.state = self.table.onLose[self.state]
+
+    def reset(self) -> None:
+        self.state = 0
+
+    def snapshot(self) -> bytes:
+        return self.state.to_bytes(4, "little")
+
+    def restore(self, snapshot: bytes) -> None:
+        self.state = int.from_bytes(snapshot, "little")
+
+    def __repr__(self) -> str:
+        return f"BettingStrategy({self.table.name}, {self.outcome}, {self.amount()})"
+
+
+class CancellationBetting(BettingStrategy):
+    """
+    The Cancellation system. The bet is the sum of the first and last amounts
+    in the sequence. A win cancels both; a loss appends the amount lost.
+    An empty sequence starts over.
+
+    The sequence is ``self.sequence[self.first:self.last]``, in a preallocated array.
+    When it reaches the end of the array, it's moved back to the start.
+
+    >>> c = CancellationBetting("Black")
+    >>> c.lose(None); c.lose(None); c.win(None)
+    >>> c.amount(), c
+    (9, BettingStrategy(cancellation, Black, [2, 3, 4, 5, 6, 7]))
+    >>> saved = c.snapshot()
+    >>> for _ in range(4):
+    ...     c.win(None)
+    >>> c.amount()
+    7
+    >>> c.restore(saved)
+    >>> c.amount()
+    9
+    """
+
+    def __init__(self, outcome: Any, initial: Sequence[int] = (1, 2, 3, 4, 5, 6), capacity: int = 64) -> None:
+        super().__init__(outcome)
+        self.initial = array("l", initial)
+        self.sequence = array("l", [0]) * max(capacity, 2 * len(initial))
+        self.reset()
+
+    def reset(self) -> None:
+        size = len(self.initial)
+        self.sequence[:size] = self.initial
+        self.first, self.last = 0, size
+
+    def amount(self) -> int:
+        if self.last - self.first > 1:
+            return self.sequence[self.first] + self.sequence[self.last - 1]
+        return self.sequence[self.first]
+
+    def win(self, bet: Any) -> None:
+        self.first += 1
+        self.last -= 1
+        if self.last <= self.first:
+            self.reset()
+
+    def lose(self, bet: Any) -> None:
+        amount = self.amount()
+        if self.last == len(self.sequence):
+            size = self.last - self.first
+            self.sequence[:size] = self.sequence[self.first:self.last]
+            self.first, self.last = 0, size
+            if size == len(self.sequence):
+                self.sequence.extend(array("l", [0]) * size)
+        self.sequence[self.last] = amount
+        self.last += 1
+
+    def snapshot(self) -> bytes:
+        return self.sequence[self.first:self.last].tobytes()
+
+    def restore(self, snapshot: bytes) -> None:
+        saved = array("l")
+        saved.frombytes(snapshot)
+        if len(saved) > len(self.sequence):
+            self.sequence.extend(array("l", [0]) * len(saved))
+        self.sequence[: len(saved)] = saved
+        self.first, self.last = 0, len(saved)
+
+    def __repr__(self) -> str:
+        return f"BettingStrategy(cancellation, {self.outcome}, {self.sequence[self.first:self.last].tolist()})"
@@ -0,0 +1,219 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+A counter-based random number generator.
+
+The Mersenne Twister behind :class:`random.Random` is sequential:
+to get the millionth number, we must generate the 999,999 before it.
+A counter-based generator computes each block of output from a key
+and a counter, with no other state. Philox4x32-10 (Salmon, et al.,
+"Parallel Random Numbers: As Easy as 1, 2, 3", SC11) maps a 128-bit
+counter and a 64-bit key to four 32-bit words.
+
+:class:`PhiloxRandom` is a :class:`random.Random` subclass,
+so it can be given to a :class:`Wheel`, :class:`Dice`, or any other
+:class:`RandomEventFactory`. The upper 64 bits of the counter
+select an independent stream; :meth:`PhiloxRandom.stream` gives the generator
+for a session number. :meth:`PhiloxRandom.jump` skips ahead in constant time.
+
+>>> rng = PhiloxRandom(42)
+>>> session_7 = rng.stream(7)
+>>> session_7.integers(8, 1, 7).tolist()
+[5, 3, 4, 6, 1, 5, 4, 4]
+
+Session 7 can be recreated at any time, in any process, without
+generating sessions 0 to 6. Skipping the first four words
+lands in the middle of the same sequence.
+
+>>> again = PhiloxRandom(42).stream(7)
+>>> again.jump(4)
+>>> again.integers(4, 1, 7).tolist()
+[1, 5, 4, 4]
+
+It works with the existing Roulette classes.
+
+>>> from roulette import BinBuilder, Wheel
+>>> wheel = Wheel(PhiloxRandom(42).stream(3))
+>>> BinBuilder().buildBins(wheel)
+>>> sorted(o.name for o in wheel.choose())
+['2', 'Black', 'Even', 'Low']
+"""
+from array import array
+import hashlib
+import os
+import random
+from typing import Any, List, Tuple
+
+MASK32 = 0xFFFFFFFF
+MASK64 = 0xFFFFFFFFFFFFFFFF
+PHILOX_M0 = 0xD2511F53
+PHILOX_M1 = 0xCD9E8D57
+PHILOX_W0 = 0x9E3779B9
+PHILOX_W1 = 0xBB67AE85
+
+
+def philox4x32(counter: Tuple[int, int, int, int], key: Tuple[int, int], rounds: int = 10) -> Tuple[int, int, int, int]:
+    """
+    The Philox4x32 bijection.
+
+    These are known-answer tests from the Random123 distribution.
+
+    >>> [f"{w:08x}" for w in philox4x32((0, 0, 0, 0), (0, 0))]
+    ['6627e8d5', 'e169c58d', 'bc57ac4c', '9b00dbd8']
+    >>> [f"{w:08x}" for w in philox4x32((MASK32,) * 4, (MASK32, MASK32))]
+    ['408f276d', '41c83b0e', 'a20bc7c6', '6d5451fd']
+    >>> [f"{w:08x}" for w in philox4x32(
+    ...     (0x243F6A88, 0x85A308D3, 0x13198A2E, 0x03707344), (0xA4093822, 0x299F31D0))]
+    ['d16cfe09', '94fdcceb', '5001e420', '24126ea1']
+    """
+    c0, c1, c2, c3 = counter
+    k0, k1 = key
+    for _ in range(rounds):
+        p0 = PHILOX_M0 * c0
+        p1 = PHILOX_M1 * c2
+        c0, c1, c2, c3 = (
+            (p1 >> 32) ^ c1 ^ k0,
+            p1 & MASK32,
+            (p0 >> 32) ^ c3 ^ k1,
+            p0 & MASK32,
+        )
+        k0 = (k0 + PHILOX_W0) & MASK32
+        k1 = (k1 + PHILOX_W1) & MASK32
+    return c0, c1, c2, c3
+
+
+class PhiloxRandom(random.Random):
+    """
+    A :class:`random.Random` driven by Philox4x32-10.
+
+    The position is a count of 32-bit words.
+    Four words are produced from each value of the counter.
+
+    >>> a = PhiloxRandom(2019)
+    >>> b = PhiloxRandom(2019)
+    >>> b.setstate(a.getstate())
+    >>> a.random() == b.random()
+    True
+    >>> a.position
+    2
+    """
+
+    def __init__(self, seed: Any = 0, stream: int = 0) -> None:
+        self._stream = stream & MASK64
+        self.position = 0
+        self._block: Tuple[int, ...] = ()
+        self._block_number = -1
+        super().__init__(seed)
+
+    def seed(self, a: Any = 0, version: int = 2) -> None:
+        """
+        Seed from an int, a float, a str or bytes (by their SHA-256 digest,
+        the same in every process), or, for ``None``, from the operating system.
+
+        >>> PhiloxRandom("session").getstate()
+        (1158759825131256383, 0, 0)
+        >>> PhiloxRandom(None).getstate() != PhiloxRandom(None).getstate()
+        True
+        """
+        if a is None:
+            a = int.from_bytes(os.urandom(8), "little")
+        elif isinstance(a, str):
+            a = int.from_bytes(hashlib.sha256(a.encode("utf-8")).digest()[:8], "little")
+        elif isinstance(a, (bytes, bytearray)):
+            a = int.from_bytes(hashlib.sha256(a).digest()[:8], "little")
+        elif isinstance(a, float):
+            a = hash(a)
+        elif not isinstance(a, int):
+            raise TypeError(f"seed must be None, int, float, str, bytes, or bytearray, not {type(a).__name__}")
+        self._seed = a & MASK64
+        self._key = (self._seed & MASK32, self._seed >> 32)
+        self.position = 0
+        self._block_number = -1
+        self.gauss_next = None
+
+    def getstate(self) -> Tuple[int, int, int]:
+        return self._seed, self._stream, self.position
+
+    def setstate(self, state: Tuple[int, ...]) -> None:
+        """
+        Restore a state from :meth:`getstate`: the seed, stream, and position.
+
+        >>> PhiloxRandom(42).setstate((3, 1, 4, 1))  # doctest: +IGNORE_EXCEPTION_DETAIL
+        Traceback (most recent call last):
+        ...
+        ValueError: state must be (seed, stream, position), not (3, 1, 4, 1)
+        """
+        if len(state) != 3:
+            raise ValueError(f"state must be (seed, stream, position), not {state}")
+        seed, self._stream, position = state
+        self.seed(seed)
+        self.position = position
+
+    def stream(self, number: int) -> "PhiloxRandom":
+        """An independent generator with the same seed, for a session or worker."""
+        return PhiloxRandom(self._seed, number)
+
+    def jump(self, n: int) -> None:
+        """Skip the next ``n`` 32-bit words."""
+        self.position += n
+
+    def _counter(self, block: int) -> Tuple[int, int, int, int]:
+        s = self._stream
+        return block & MASK32, block >> 32 & MASK32, s & MASK32, s >> 32
+
+    def _word(self) -> int:
+        block, offset = divmod(self.position, 4)
+        if block != self._block_number:
+            self._block = philox4x32(self._counter(block), self._key)
+            self._block_number = block
+        self.position += 1
+        return self._block[offset]
+
+    def random(self) -> float:
+        """53 random bits from two words, the same way as :mod:`random`."""
+        a, b = self._word() >> 5, self._word() >> 6
+        return (a * 67108864.0 + b) * (1.0 / 9007199254740992.0)
+
+    def getrandbits(self, k: int) -> int:
+        if k <= 32:
+            return self._word() >> (32 - k)
+        words, extra = divmod(k, 32)
+        result = 0
+        for i in range(words):
+            result |= self._word() << (32 * i)
+        if extra:
+            result |= (self._word() >> (32 - extra)) << (32 * words)
+        return result
+
+    def integers(self, n: int, low: int, high: int) -> array:
+        """
+        ``n`` uniform integers in ``range(low, high)``, computed
+        a block at a time. Words at or above the largest multiple
+        of the range are rejected to avoid bias.
+
+        >>> rng = PhiloxRandom(42)
+        >>> rolls = rng.integers(6000, 1, 7)
+        >>> len(rolls), min(rolls), max(rolls)
+        (6000, 1, 6)
+        >>> PhiloxRandom(42).integers(5, 0, 38).tolist()
+        [21, 19, 17, 29, 3]
+        """
+        span = high - low
+        assert 0 < span <= 1 << 32, f"bad range {low}, {high}"
+        limit = (1 << 32) // span * span
+        result = array("q")
+        append = result.append
+        key, counter = self._key, self._counter
+        block, offset = divmod(self.position, 4)
+        while len(result) < n:
+            words: List[int] = list(philox4x32(counter(block), key))[offset:]
+            for w in words:
+                offset += 1
+                if w < limit:
+                    append(low + w % span)
+                    if len(result) == n:
+                        break
+            if offset == 4:
+                block, offset = block + 1, 0
+        self.position = block * 4 + offset
+        return result
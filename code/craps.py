@@ -0,0 +1,412 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+Craps definitions for performance examples.
+
+The :class:`Dice` contain 36 :class:`Throw` instances, built by a
+:class:`ThrowBuilder`. Each :class:`Throw` has the one-roll proposition
+:class:`Outcome` instances that win on that throw.
+
+Money is fixed-point: every stake, bet amount, and table limit is an
+:class:`int` number of cents. Odds are integers scaled by :data:`ODDS_SCALE`,
+60, so that every craps payout ratio is exact: :math:`27:4` is 405,
+:math:`6:5` is 72, :math:`2:3` is 40. A payout is one multiply and one
+floor division. The book's :class:`fractions.Fraction` odds are exact, too,
+but each operation normalizes with a GCD. The rounding rules
+favor the house, as a real table does: a payout of a fraction of a cent
+is rounded down, and a commission is rounded up.
+
+>>> dice = Dice(random.Random(42))
+>>> ThrowBuilder().buildThrows(dice)
+>>> len(dice.throws)
+36
+>>> t = dice.getThrow(1, 1)
+>>> t, t.hard()
+(Throw(1, 1), True)
+>>> for o in sorted(t.outcomes, key=lambda o: o.name):
+...     print(o, dollars(o.winAmount(cents(10), t)))
+Any Craps (7:1) $70.00
+Field (1:1, 2 and 12 2:1) $20.00
+Horn (27:4, 3:1) $67.50
+Number 2 (30:1) $300.00
+
+A player bets the pass line, and takes double odds on the point.
+A session can run past 250 throws, to settle the bets that are working.
+
+>>> from roulette import Simulator
+>>> table = Table(limit=cents(300), minimum=cents(5))
+>>> game = CrapsGame(Dice(random.Random(42)), table)
+>>> ThrowBuilder().buildThrows(game.dice)
+>>> sim = Simulator(game, PassLineOdds(table, cents(5), multiple=2), initStake=cents(100), samples=5)
+>>> sim.gather()
+>>> sim.durations
+[158, 252, 259, 180, 258]
+>>> [dollars(m) for m in sim.maxima]
+['$116.00', '$212.00', '$233.00', '$127.00', '$184.00']
+"""
+from dataclasses import dataclass
+from fractions import Fraction
+import math
+import random
+from typing import Dict, Iterator, List, Optional, Tuple, Type
+
+CENTS = 100
+ODDS_SCALE = 60
+
+
+def odds(numerator: int, denominator: int = 1) -> int:
+    """
+    Odds of ``numerator``:``denominator``, scaled by :data:`ODDS_SCALE`.
+
+    >>> odds(27, 4), odds(6, 5), odds(2, 3)
+    (405, 72, 40)
+    >>> odds(1, 7)  # doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+    ...
+    ValueError: 1:7 is not exact
+    """
+    scaled, remainder = divmod(numerator * ODDS_SCALE, denominator)
+    if remainder:
+        raise ValueError(f"{numerator}:{denominator} is not exact")
+    return scaled
+
+
+def cents(amount: int) -> int:
+    """Whole dollars as cents."""
+    return amount * CENTS
+
+
+def dollars(amount: int) -> str:
+    """
+    Format a number of cents.
+
+    >>> dollars(6750), dollars(-5)
+    ('$67.50', '-$0.05')
+    """
+    sign = "-" if amount < 0 else ""
+    whole, part = divmod(abs(amount), CENTS)
+    return f"{sign}${whole}.{part:02d}"
+
+
+@dataclass(frozen=True)
+class Outcome:
+    """A named outcome with odds of ``odds`` / :data:`ODDS_SCALE`:1."""
+
+    name: str
+    odds: int
+
+    def winAmount(self, amount: int, throw: Optional["Throw"] = None) -> int:
+        return amount * self.odds // ODDS_SCALE
+
+    def __str__(self) -> str:
+        ratio = Fraction(self.odds, ODDS_SCALE)
+        return f"{self.name} ({ratio.numerator}:{ratio.denominator})"
+
+
+@dataclass(frozen=True)
+class OutcomeField(Outcome):
+    """Pays 2:1 on 2 and 12, and 1:1 on the other field numbers."""
+
+    def winAmount(self, amount: int, throw: Optional["Throw"] = None) -> int:
+        if throw and throw.total in (2, 12):
+            return amount * 2
+        return amount * self.odds // ODDS_SCALE
+
+    def __str__(self) -> str:
+        return f"{self.name} (1:1, 2 and 12 2:1)"
+
+
+@dataclass(frozen=True)
+class OutcomeHorn(Outcome):
+    """Pays 27:4 on 2 and 12, and 3:1 on 3 and 11."""
+
+    def winAmount(self, amount: int, throw: Optional["Throw"] = None) -> int:
+        if throw and throw.total in (3, 11):
+            return amount * 3
+        return amount * self.odds // ODDS_SCALE
+
+    def __str__(self) -> str:
+        return f"{self.name} (27:4, 3:1)"
+
+
+class Bet:
+    """
+    An amount, in cents, on an :class:`Outcome`.
+    A line bet can be moved to another outcome when a point is established.
+
+    >>> b = Bet(cents(20), Outcome("Odds on 6", odds(6, 5)))
+    >>> b.price(), b.winAmount()
+    (2000, 4400)
+    """
+
+    def __init__(self, amountBet: int, outcome: Outcome) -> None:
+        self.amountBet = amountBet
+        self.outcome = outcome
+
+    def setOutcome(self, outcome: Outcome) -> None:
+        self.outcome = outcome
+
+    def price(self) -> int:
+        return self.amountBet
+
+    def winAmount(self, throw: Optional["Throw"] = None) -> int:
+        return self.amountBet + self.outcome.winAmount(self.amountBet, throw)
+
+    def loseAmount(self) -> int:
+        return self.amountBet
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.amountBet}, {self.outcome})"
+
+
+class CommissionBet(Bet):
+    """
+    A Buy or Lay bet, with a commission (the vig) of ``vig`` percent.
+    A Buy bet, with odds of at least 1:1, pays the vig on the amount bet.
+    A Lay bet pays the vig on the amount it can win.
+    The vig is rounded up to the cent.
+
+    >>> buy = CommissionBet(cents(20), Outcome("Buy 4", odds(2)))
+    >>> dollars(buy.price()), dollars(buy.winAmount())
+    ('$21.00', '$60.00')
+    >>> lay = CommissionBet(cents(30), Outcome("Lay 4", odds(1, 2)))
+    >>> dollars(lay.price()), dollars(lay.winAmount())
+    ('$30.75', '$45.00')
+    >>> dollars(CommissionBet(333, Outcome("Buy 6", odds(6, 5))).price())
+    '$3.50'
+    """
+
+    def __init__(self, amountBet: int, outcome: Outcome, vig: int = 5) -> None:
+        super().__init__(amountBet, outcome)
+        self.vig = vig
+
+    def price(self) -> int:
+        if self.outcome.odds >= ODDS_SCALE:
+            base = self.amountBet
+        else:
+            base = self.outcome.winAmount(self.amountBet)
+        return self.amountBet + -(-base * self.vig // 100)
+
+
+class FractionBet(Bet):
+    """
+    A line bet paid with the book's arithmetic: the odds as a :class:`fractions.Fraction`,
+    with the payout rounded down to the cent at the end. It pays the same as a :class:`Bet`,
+    more slowly; :mod:`benchmark` compares the two.
+
+    >>> FractionBet(cents(5), Outcome("Pass Odds 5", odds(3, 2))).winAmount()
+    1250
+    """
+
+    def winAmount(self, throw: Optional["Throw"] = None) -> int:
+        return self.amountBet + math.floor(self.amountBet * Fraction(self.outcome.odds, ODDS_SCALE))
+
+
+class InvalidBet(Exception):
+    pass
+
+
+class Table:
+    """The working bets, with limits in cents."""
+
+    def __init__(self, *bets: Bet, limit: int = 300 * CENTS, minimum: int = 5 * CENTS) -> None:
+        self.bets: List[Bet] = list(bets)
+        self.limit = limit
+        self.minimum = minimum
+
+    def placeBet(self, bet: Bet) -> None:
+        self.bets.append(bet)
+
+    def isValid(self) -> None:
+        total = sum(b.amountBet for b in self.bets)
+        if total > self.limit:
+            raise InvalidBet(f"{dollars(total)} > {dollars(self.limit)}")
+        if any(b.amountBet < self.minimum for b in self.bets):
+            raise InvalidBet(f"bet below {dollars(self.minimum)}")
+
+    def clear(self) -> None:
+        self.bets.clear()
+
+    def __iter__(self) -> Iterator[Bet]:
+        return iter(self.bets[:])
+
+
+class Throw:
+    """One of the 36 ways the dice can fall, and the outcomes that win."""
+
+    def __init__(self, d1: int, d2: int, *outcomes: Outcome) -> None:
+        self.d1 = d1
+        self.d2 = d2
+        self.total = d1 + d2
+        self.outcomes = frozenset(outcomes)
+
+    def hard(self) -> bool:
+        return self.d1 == self.d2
+
+    def key(self) -> Tuple[int, int]:
+        return self.d1, self.d2
+
+    def __contains__(self, outcome: Outcome) -> bool:
+        return outcome in self.outcomes
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.d1}, {self.d2})"
+
+
+class Dice:
+    """The collection of :class:`Throw` instances and a random number generator."""
+
+    def __init__(self, rng: Optional[random.Random] = None) -> None:
+        self.throws: Dict[Tuple[int, int], Throw] = {}
+        self.rng = rng or random.Random()
+        self._all: Tuple[Throw, ...] = ()
+
+    def addThrow(self, throw: Throw) -> None:
+        self.throws[throw.key()] = throw
+        self._all = tuple(self.throws.values())
+
+    def roll(self) -> Throw:
+        return self.rng.choice(self._all)
+
+    def getThrow(self, d1: int, d2: int) -> Throw:
+        return self.throws[d1, d2]
+
+
+class ThrowBuilder:
+    """Builds the 36 :class:`Throw` instances with the proposition outcomes."""
+
+    def buildThrows(self, dice: Dice) -> None:
+        number = {
+            2: Outcome("Number 2", odds(30)),
+            3: Outcome("Number 3", odds(15)),
+            7: Outcome("Number 7", odds(4)),
+            11: Outcome("Number 11", odds(15)),
+            12: Outcome("Number 12", odds(30)),
+        }
+        any_craps = Outcome("Any Craps", odds(7))
+        horn = OutcomeHorn("Horn", odds(27, 4))
+        field = OutcomeField("Field", odds(1))
+        for d1 in range(1, 7):
+            for d2 in range(1, 7):
+                s = d1 + d2
+                outcomes = []
+                if s in number:
+                    outcomes.append(number[s])
+                if s in (2, 3, 12):
+                    outcomes.append(any_craps)
+                if s in (2, 3, 11, 12):
+                    outcomes.append(horn)
+                if s in (2, 3, 4, 9, 10, 11, 12):
+                    outcomes.append(field)
+                dice.addThrow(Throw(d1, d2, *outcomes))
+
+
+class Player:
+    """Places bets in Craps. The stake is in cents; a bet costs its :meth:`Bet.price`."""
+
+    def __init__(self, table: Table) -> None:
+        self.table = table
+        self.stake = 0
+        self.roundsToGo = 0
+
+    def playing(self) -> bool:
+        """Bets still working on the table must be resolved."""
+        return bool(self.table.bets) or (self.roundsToGo > 0 and self.stake >= self.table.minimum)
+
+    def placeBet(self, bet: Bet) -> None:
+        self.stake -= bet.price()
+        self.table.placeBet(bet)
+
+    def placeBets(self, game: "CrapsGame") -> None:
+        raise NotImplementedError
+
+    def win(self, bet: Bet, throw: Throw) -> None:
+        self.stake += bet.winAmount(throw)
+
+    def lose(self, bet: Bet) -> None:
+        pass
+
+    def reset(self, duration: int, stake: int) -> None:
+        self.roundsToGo = duration
+        self.stake = stake
+        self.table.clear()
+
+
+class PassLineOdds(Player):
+    """
+    Bets the pass line on the come out roll, then takes odds of ``multiple`` times the bet,
+    as much of that as the stake and the table limit allow. The bets are instances of ``bet``.
+    """
+
+    def __init__(self, table: Table, amount: int, multiple: int = 1, bet: Type[Bet] = Bet) -> None:
+        super().__init__(table)
+        self.amount = amount
+        self.multiple = multiple
+        self.bet = bet
+
+    def placeBets(self, game: "CrapsGame") -> None:
+        bets = self.table.bets
+        if not bets:
+            if game.point == 0 and self.roundsToGo > 0 and self.stake >= self.amount:
+                self.placeBet(self.bet(self.amount, game.passLine))
+        elif len(bets) == 1 and game.point:
+            room = self.table.limit - sum(b.amountBet for b in bets)
+            amount = min(self.amount * self.multiple, self.stake, room)
+            if amount >= self.table.minimum:
+                self.placeBet(self.bet(amount, game.passOdds[game.point]))
+
+
+class CrapsGame:
+    """
+    Just enough of the game for the line bets: the pass line and the odds behind it.
+    Every working bet wins on the point and loses on a seven, and on the
+    come out roll, a natural wins and craps loses.
+    """
+
+    def __init__(self, dice: Dice, table: Table) -> None:
+        self.dice = dice
+        self.table = table
+        self.point = 0
+        self.passLine = Outcome("Pass Line", odds(1))
+        self.passOdds = {
+            n: Outcome(f"Pass Odds {n}", odds(*ratio))
+            for n, ratio in ((4, (2, 1)), (5, (3, 2)), (6, (6, 5)), (8, (6, 5)), (9, (3, 2)), (10, (2, 1)))
+        }
+
+    def roll(self) -> Throw:
+        """Roll the dice, after the bets are placed."""
+        return self.dice.roll()
+
+    def reset(self) -> None:
+        """Start a session: no bets, and the next roll is a come out roll."""
+        self.table.clear()
+        self.point = 0
+
+    def cycle(self, player: Player) -> None:
+        if not player.playing():
+            return
+        player.placeBets(self)
+        self.table.isValid()
+        throw = self.roll()
+        total = throw.total
+        if self.point == 0:
+            if total in (7, 11):
+                self.resolve(player, throw, True)
+            elif total in (2, 3, 12):
+                self.resolve(player, throw, False)
+            else:
+                self.point = total
+        elif total == self.point:
+            self.resolve(player, throw, True)
+        elif total == 7:
+            self.resolve(player, throw, False)
+        player.roundsToGo -= 1
+
+    def resolve(self, player: Player, throw: Throw, won: bool) -> None:
+        for bet in self.table.bets:
+            if won:
+                player.win(bet, throw)
+            else:
+                player.lose(bet)
+        self.table.clear()
+        self.point = 0
@@ -0,0 +1,409 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+Run :class:`roulette.Simulator` sessions on many processes, or many machines.
+
+The coordinator splits the session numbers into shards, and serves
+a :class:`WorkBoard` with :mod:`multiprocessing.managers`
+over a TCP socket. Each worker has a queue of shards.
+A worker with an empty queue steals from the back of the longest queue.
+Workers send back a partial :class:`Summary` for each shard,
+which the board merges as it arrives.
+
+A shard that raises an exception is put back on a queue and retried,
+up to a limit. A shard whose worker stops responding is retried when its
+lease expires. Each session uses its own :class:`counter_rng.PhiloxRandom`
+stream, so the results don't depend on which worker ran which session.
+
+>>> serial = runSessions(0, 20, seed=42)
+>>> serial[0]
+Summary(count=20, total=1748, total_sq=283470, maximum=250)
+>>> round(serial[0].mean(), 2), round(serial[1].mean(), 2)
+(87.4, 141.4)
+
+To use several machines, start a coordinator that expects remote workers,
+then start each worker with the coordinator's address::
+
+    python distributed.py coordinator --sessions 100000 --local 0 --queues 16 --bind 0.0.0.0 --port 5000
+    python distributed.py worker coordinator.example.com 5000 --id 3
+
+The ``SIM_AUTHKEY`` environment variable must have the same value everywhere.
+The manager uses :mod:`pickle`, so anyone with the key can run code on the coordinator:
+without ``SIM_AUTHKEY``, the coordinator only listens on the loopback interface,
+with a random key that it gives to its own workers. ``--bind`` chooses the interface.
+A worker renews the lease on its shard while it's running it.
+"""
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import ipaddress
+import multiprocessing
+from multiprocessing.managers import BaseManager
+import os
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, FrozenSet, Iterator, List, Optional, Tuple, TypeVar
+
+from counter_rng import PhiloxRandom
+from layout_snapshot import build
+from roulette import Game, Martingale, Simulator, Table
+from session_stats import Summary
+
+Shard = Tuple[int, int, int, int]  # shard number, attempt, first session, last session
+T = TypeVar("T")
+PROCESS, THREAD = "process", "thread"
+
+
+def runSessions(first: int, last: int, seed: int) -> Tuple[Summary, Summary]:
+    """Durations and maxima for Martingale sessions ``first`` to ``last - 1``."""
+    table = Table(limit=300, minimum=1)
+    wheel = build().wheel()
+    sim = Simulator(Game(wheel, table), Martingale(table))
+    base = PhiloxRandom(seed)
+    durations, maxima = Summary(), Summary()
+    for number in range(first, last):
+        wheel.rng = base.stream(number)
+        stakes = sim.session()
+        durations.add(len(stakes))
+        maxima.add(max(stakes, default=sim.initStake))
+    return durations, maxima
+
+
+def runLocal(
+    job: Callable[[int, int, int], T],
+    sessions: int,
+    seed: int = 42,
+    workers: int = 1,
+    batch: int = 0,
+    backend: str = PROCESS,
+) -> List[T]:
+    """
+    Run ``job(first, last, seed)`` on shards of ``sessions`` sessions,
+    with ``workers`` worker processes or threads on this machine.
+    Return the result of each shard, in order.
+    A process job must be picklable, for example, a module-level function
+    or a :func:`functools.partial` of one; one process worker runs in this process.
+    Threads share whatever the job refers to. They run in parallel only on
+    a free-threaded build of CPython.
+
+    >>> shards = runLocal(runSessions, 20, seed=42, workers=2, batch=5, backend=THREAD)
+    >>> durations = Summary()
+    >>> for d, _ in shards:
+    ...     durations.merge(d)
+    >>> durations == runSessions(0, 20, seed=42)[0]
+    True
+    """
+    batch = batch or max(1, sessions // (workers * 4))
+    bounds = [(s, min(s + batch, sessions)) for s in range(0, sessions, batch)]
+    if backend == THREAD:
+        with ThreadPoolExecutor(workers) as executor:
+            return list(executor.map(lambda b: job(b[0], b[1], seed), bounds))
+    if backend != PROCESS:
+        raise ValueError(f"unknown backend {backend!r}")
+    if workers == 1:
+        return [job(first, last, seed) for first, last in bounds]
+    with multiprocessing.Pool(workers) as pool:
+        return pool.starmap(job, [(first, last, seed) for first, last in bounds])
+
+
+class ShardFailed(Exception):
+    pass
+
+
+def authkey() -> Optional[bytes]:
+    """The shared key from ``SIM_AUTHKEY``, if it's set."""
+    key = os.environ.get("SIM_AUTHKEY")
+    return key.encode("utf-8") if key else None
+
+
+def loopback(host: str) -> bool:
+    """
+    True if ``host`` only accepts connections from this machine.
+
+    >>> loopback("127.0.0.1"), loopback("localhost"), loopback(""), loopback("0.0.0.0")
+    (True, True, False, False)
+    """
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class WorkBoard:
+    """
+    The coordinator's shared state. Workers use it through a proxy,
+    from the manager's server threads, so all methods hold a lock.
+    """
+
+    def __init__(self, shards: List[Tuple[int, int]], queues: int, max_attempts: int = 3, lease: float = 30.0) -> None:
+        self.shards = shards
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.lock = threading.Lock()
+        self.queues: List[Deque[Tuple[int, int]]] = [deque() for _ in range(queues)]
+        for number in range(len(shards)):
+            self.queues[number % queues].append((number, 0))
+        self.leases: Dict[int, Tuple[int, float]] = {}
+        self.completed: set = set()
+        self.failed: Dict[int, str] = {}
+        self.durations, self.maxima = Summary(), Summary()
+        self.stolen = self.retried = 0
+
+    def take(self, worker: int) -> Optional[Shard]:
+        with self.lock:
+            self._expire()
+            queue = self.queues[worker % len(self.queues)]
+            if queue:
+                number, attempt = queue.popleft()
+            else:
+                victim = max(self.queues, key=len)
+                if not victim:
+                    return None
+                number, attempt = victim.pop()
+                self.stolen += 1
+            self.leases[number] = (attempt, time.monotonic() + self.lease)
+            first, last = self.shards[number]
+            return number, attempt, first, last
+
+    def renew(self, number: int, attempt: int) -> bool:
+        """Extend the lease on a shard that's still running; False if the lease was lost."""
+        with self.lock:
+            held = self.leases.get(number)
+            if held is None or held[0] != attempt:
+                return False
+            self.leases[number] = (attempt, time.monotonic() + self.lease)
+            return True
+
+    def heartbeat(self) -> float:
+        """Seconds between a worker's lease renewals."""
+        return self.lease / 3
+
+    def complete(self, number: int, durations: Summary, maxima: Summary) -> None:
+        """Merge a shard's results. A late result for a shard that ran out of attempts still counts."""
+        with self.lock:
+            self.leases.pop(number, None)
+            if number in self.completed:
+                return
+            self.completed.add(number)
+            self.failed.pop(number, None)
+            self.durations.merge(durations)
+            self.maxima.merge(maxima)
+
+    def fail(self, number: int, attempt: int, error: str) -> None:
+        with self.lock:
+            self.leases.pop(number, None)
+            self._retry(number, attempt, error)
+
+    def _retry(self, number: int, attempt: int, error: str) -> None:
+        if number in self.completed:
+            return
+        if attempt + 1 >= self.max_attempts:
+            self.failed[number] = error
+            return
+        self.retried += 1
+        min(self.queues, key=len).append((number, attempt + 1))
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for number, (attempt, deadline) in list(self.leases.items()):
+            if deadline < now:
+                del self.leases[number]
+                self._retry(number, attempt, "lease expired")
+
+    def finished(self) -> bool:
+        with self.lock:
+            self._expire()
+            return len(self.completed | self.failed.keys()) == len(self.shards)
+
+    def report(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "durations": self.durations,
+                "maxima": self.maxima,
+                "shards": len(self.shards),
+                "stolen": self.stolen,
+                "retried": self.retried,
+                "completed": len(self.completed),
+                "failed": dict(self.failed),
+            }
+
+
+class BoardClient(BaseManager):
+    pass
+
+
+BoardClient.register("board")
+
+_board: Optional[WorkBoard] = None
+
+
+def _host(shards: List[Tuple[int, int]], queues: int, lease: float) -> None:
+    """Run in the manager's process: create the board it serves."""
+    global _board
+    _board = WorkBoard(shards, queues, lease=lease)
+
+
+def _hosted() -> Optional[WorkBoard]:
+    return _board
+
+
+class BoardServer(BaseManager):
+    pass
+
+
+BoardServer.register("board", callable=_hosted)
+
+
+@contextmanager
+def renewing(board: Any, number: int, attempt: int, every: float) -> Iterator[None]:
+    """Renew the lease on a shard every ``every`` seconds, from another thread, while the ``with`` statement runs."""
+    stop = threading.Event()
+
+    def beat() -> None:
+        while not stop.wait(every):
+            if not board.renew(number, attempt):
+                return
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def worker(
+    address: Tuple[str, int],
+    worker_id: int,
+    seed: int,
+    key: Optional[bytes] = None,
+    chaos: FrozenSet[int] = frozenset(),
+    crash: bool = False,
+) -> None:
+    """
+    Take shards from the board until all the work is done.
+    The ``key`` defaults to ``SIM_AUTHKEY``.
+    For testing, the first attempt at a shard in ``chaos`` raises an exception,
+    and ``crash`` makes the worker die holding its first shard.
+    """
+    key = key or authkey()
+    if key is None:
+        raise ValueError("set SIM_AUTHKEY to the coordinator's key")
+    client = BoardClient(address=address, authkey=key)
+    client.connect()
+    board = client.board()  # type: ignore[attr-defined]
+    every = board.heartbeat()
+    while True:
+        shard = board.take(worker_id)
+        if shard is None:
+            if board.finished():
+                return
+            time.sleep(0.05)
+            continue
+        number, attempt, first, last = shard
+        if crash:
+            os._exit(1)
+        try:
+            if attempt == 0 and number in chaos:
+                raise RuntimeError(f"chaos in shard {number}")
+            with renewing(board, number, attempt, every):
+                durations, maxima = runSessions(first, last, seed)
+        except Exception as ex:
+            board.fail(number, attempt, repr(ex))
+        else:
+            board.complete(number, durations, maxima)
+
+
+def coordinate(
+    sessions: int,
+    local: int = 2,
+    queues: Optional[int] = None,
+    batch: int = 50,
+    seed: int = 42,
+    port: int = 0,
+    bind: str = "127.0.0.1",
+    lease: float = 30.0,
+    chaos: FrozenSet[int] = frozenset(),
+    crashers: int = 0,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Serve a :class:`WorkBoard` from a manager process on ``bind`` and ``port``,
+    and start ``local`` worker processes,
+    plus ``crashers`` that die holding a shard. Remote workers can connect, too,
+    if ``bind`` isn't a loopback address; that requires ``SIM_AUTHKEY``.
+    Wait until every shard is done; raise :exc:`ShardFailed` if any shard
+    used up all its attempts.
+    """
+    key = authkey()
+    if key is None:
+        if not loopback(bind):
+            raise ValueError(f"set SIM_AUTHKEY to accept remote workers on {bind or 'every interface'}")
+        key = os.urandom(32)
+    shards = [(s, min(s + batch, sessions)) for s in range(0, sessions, batch)]
+    server = BoardServer(address=(bind, port), authkey=key)
+    server.start(_host, (shards, queues or max(local, 1), lease))
+    board = server.board()  # type: ignore[attr-defined]
+    listening = server.address
+    assert isinstance(listening, tuple), listening
+    address = ("127.0.0.1" if bind in ("", "0.0.0.0") else bind, listening[1])
+    processes = [
+        multiprocessing.Process(target=worker, args=(address, n, seed, key, chaos, n < crashers))
+        for n in range(local + crashers)
+    ]
+    start = time.monotonic()
+    try:
+        for p in processes:
+            p.start()
+        while not board.finished():
+            if timeout is not None and time.monotonic() - start > timeout:
+                raise TimeoutError(f"{board.report()['completed']} of {len(shards)} shards done")
+            time.sleep(0.05)
+        report = board.report()
+    finally:
+        for p in processes:
+            if p.pid is not None:
+                p.join(timeout=5)
+                if p.is_alive():
+                    p.terminate()
+        server.shutdown()
+    if report["failed"]:
+        raise ShardFailed(report["failed"])
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    commands = parser.add_subparsers(dest="command", required=True)
+    coord = commands.add_parser("coordinator")
+    coord.add_argument("--sessions", type=int, default=10_000)
+    coord.add_argument("--local", type=int, default=multiprocessing.cpu_count())
+    coord.add_argument("--queues", type=int, default=None)
+    coord.add_argument("--batch", type=int, default=50)
+    coord.add_argument("--seed", type=int, default=42)
+    coord.add_argument("--port", type=int, default=0)
+    coord.add_argument("--bind", default="127.0.0.1", help="the interface for remote workers; needs SIM_AUTHKEY")
+    work = commands.add_parser("worker")
+    work.add_argument("host")
+    work.add_argument("port", type=int)
+    work.add_argument("--id", type=int, default=0)
+    work.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    if authkey() is None and (args.command == "worker" or not loopback(args.bind)):
+        parser.error("set SIM_AUTHKEY")
+    if args.command == "worker":
+        worker((args.host, args.port), args.id, args.seed)
+        return
+    report = coordinate(args.sessions, args.local, args.queues, args.batch, args.seed, args.port, args.bind)
+    for name in ("durations", "maxima"):
+        s = report[name]
+        print(f"{name:9s} n={s.count} mean={s.mean():.2f} stdev={s.stdev():.2f} max={s.maximum}")
+    print(f"shards={report['shards']} stolen={report['stolen']} retried={report['retried']}")
+
+
+if __name__ == "__main__":
+    main()  # pragma: no cover
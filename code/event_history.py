@@ -0,0 +1,181 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+A shared history of spins or throws.
+
+The :class:`SevenReds` player waits for seven reds in a row, and the
+:class:`CrapsSevenCountPlayer` counts the throws since the last seven.
+Each could keep its own list of events, and rescan it for each decision.
+An :class:`EventHistory` keeps the last few events in a preallocated
+:class:`array.array` ring buffer, and updates its statistics as each
+event arrives: the current run, the events since each number last appeared,
+and the frequency of each number in the window. Each update is constant time.
+
+The :class:`HistoryGame` publishes each spin to the history once per cycle.
+Players subscribe by holding a reference to the same history; nothing is copied.
+
+>>> import random
+>>> from layout_snapshot import build
+>>> from roulette import Table
+>>> wheel = build().wheel(random.Random(2))
+>>> table = Table(limit=300, minimum=1)
+>>> history = colorHistory(wheel, size=38)
+>>> game = HistoryGame(wheel, table, history)
+>>> player = SevenReds(table, history, wait=3)
+>>> player.reset(250, 100)
+>>> for _ in range(250):
+...     game.cycle(player)
+>>> len(history), history.total, history.sinceLast(0), history.frequency(0)
+(38, 250, 57, 0)
+>>> history.run(RED), history.run(BLACK), history.longest
+(0, 2, {1: 6, 2: 6, 0: 2})
+>>> player.stake
+116
+
+A :class:`craps.Dice` publishes the total of each throw.
+
+>>> from craps import Dice, ThrowBuilder
+>>> dice = Dice(random.Random(42))
+>>> ThrowBuilder().buildThrows(dice)
+>>> throws = EventHistory(size=16, numbers=13)
+>>> for _ in range(20):
+...     throws.publish(dice.roll().total)
+>>> list(throws)[-6:], throws.sinceLast(7), throws[-1]
+([6, 9, 3, 12, 4, 11], 7, 11)
+"""
+from array import array
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+from roulette import BetPool, Bin, Game, Martingale, Table, Wheel
+
+# Keys for the roulette colors; see colorHistory().
+GREEN, RED, BLACK = range(3)
+
+
+class EventHistory:
+    """
+    The last ``size`` events, each an integer in ``range(numbers)``:
+    a bin number, or the total of a throw.
+
+    The frequencies count events in the window. The runs and
+    :meth:`sinceLast` count all events since the history was created or cleared.
+    Runs are of events with the same key, from ``keys``, a sequence
+    with a key for each number.
+
+    >>> h = EventHistory(size=4, numbers=10, keys=[n % 2 for n in range(10)])
+    >>> for n in (3, 5, 4, 6, 8, 1):
+    ...     h.publish(n)
+    >>> list(h), h.frequency(3), h.frequency(6), h.sinceLast(3), h.sinceLast(9)
+    ([4, 6, 8, 1], 0, 1, 5, 6)
+    >>> h.run(1), h.run(0), h.longest
+    (1, 0, {1: 2, 0: 3})
+    """
+
+    def __init__(self, size: int = 64, numbers: int = 38, keys: Optional[Sequence[int]] = None) -> None:
+        assert numbers <= 256, "events are stored as bytes"
+        self.size = size
+        self.numbers = numbers
+        self.keys = keys
+        self.events = array("B", bytes(size))
+        self.counts = array("l", [0]) * numbers
+        self.last = array("q", [-1]) * numbers
+        self.clear()
+
+    def clear(self) -> None:
+        self.head = 0
+        self.total = 0
+        for n in range(self.numbers):
+            self.counts[n] = 0
+            self.last[n] = -1
+        self.runKey: Optional[int] = None
+        self.runLength = 0
+        self.longest: Dict[int, int] = {}
+
+    def publish(self, number: int) -> None:
+        events, head = self.events, self.head
+        if self.total >= self.size:
+            self.counts[events[head]] -= 1
+        events[head] = number
+        self.counts[number] += 1
+        self.head = head + 1 if head + 1 < self.size else 0
+        self.last[number] = self.total
+        self.total += 1
+        if self.keys is not None:
+            key = self.keys[number]
+            if key == self.runKey:
+                self.runLength += 1
+            else:
+                self.runKey, self.runLength = key, 1
+            if self.runLength > self.longest.get(key, 0):
+                self.longest[key] = self.runLength
+
+    def run(self, key: int) -> int:
+        """The length of the current run of ``key``, zero if the last event had another key."""
+        return self.runLength if self.runKey == key else 0
+
+    def sinceLast(self, number: int) -> int:
+        """The events after the last ``number``; all of them, if it hasn't appeared."""
+        last = self.last[number]
+        return self.total - 1 - last if last >= 0 else self.total
+
+    def frequency(self, number: int) -> int:
+        return self.counts[number]
+
+    def __len__(self) -> int:
+        return min(self.total, self.size)
+
+    def __getitem__(self, index: int) -> int:
+        """Events by age: ``[0]`` is the oldest in the window, ``[-1]`` the newest."""
+        n = len(self)
+        if not -n <= index < n:
+            raise IndexError(index)
+        return self.events[(self.head - n + index % n) % self.size]
+
+    def __iter__(self) -> Iterator[int]:
+        """The window, oldest first."""
+        n = len(self)
+        for i in range(self.head - n, self.head):
+            yield self.events[i % self.size]
+
+
+def keysFor(events: Sequence[Any], *outcomes: Any) -> array:
+    """
+    A key for each event: one more than the index of the first of
+    ``outcomes`` it contains, or zero. ``events`` can be the
+    :class:`roulette.Bin` or :class:`craps.Throw` instances.
+    """
+    keys = array("B", bytes(len(events)))
+    for n, event in enumerate(events):
+        keys[n] = next((i + 1 for i, o in enumerate(outcomes) if o in event), 0)
+    return keys
+
+
+def colorHistory(wheel: Wheel, size: int = 64) -> EventHistory:
+    """An :class:`EventHistory` for ``wheel``, keyed by :data:`RED`, :data:`BLACK`, or :data:`GREEN`."""
+    keys = keysFor(wheel.bins, wheel.getOutcome("Red"), wheel.getOutcome("Black"))
+    return EventHistory(size, len(wheel.bins), keys)
+
+
+class HistoryGame(Game):
+    """A :class:`Game` that publishes every spin to an :class:`EventHistory`."""
+
+    def __init__(self, wheel: Wheel, table: Table, history: EventHistory) -> None:
+        super().__init__(wheel, table)
+        self.history = history
+
+    def resolve(self, player: Any, winners: Bin) -> None:
+        self.history.publish(self.wheel.last)
+        super().resolve(player, winners)
+
+
+class SevenReds(Martingale):
+    """Waits for ``wait`` reds in a row, then plays the Martingale system on black."""
+
+    def __init__(self, table: Table, history: EventHistory, wait: int = 7, pool: Optional[BetPool] = None) -> None:
+        super().__init__(table, pool)
+        self.history = history
+        self.wait = wait
+
+    def placeBets(self) -> None:
+        if self.history.run(RED) >= self.wait:
+            super().placeBets()
@@ -0,0 +1,197 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+Prebuilt game layouts.
+
+Every process builds the same structures: the 38 :class:`roulette.Bin` instances
+from :class:`roulette.BinBuilder`, the 36 :class:`craps.Throw` instances from
+:class:`craps.ThrowBuilder`, and a deck from :func:`blackjack.card_factory`.
+A snapshot file holds these, built once. A worker process loads
+the snapshot instead of running the builders. A worker forked from a
+process that already loaded the layouts inherits them with no work at all.
+
+A snapshot has a fixed-size header followed by a pickle::
+
+    magic (8 bytes) | version (4 bytes) | fingerprint (32 bytes) | sha256 (32 bytes) | pickle
+
+The fingerprint is a hash of the builders' source. If the builders change,
+the snapshot is stale. The sha256 is the payload's digest; a truncated or damaged
+file is detected. In either case, :func:`load` rebuilds the layouts and
+writes a new snapshot.
+
+>>> import random, tempfile
+>>> from pathlib import Path
+>>> path = Path(tempfile.mkdtemp()) / "layouts.snapshot"
+>>> layouts, status = load(path)
+>>> status
+'missing'
+>>> layouts, status = load(path)
+>>> status
+'loaded'
+>>> wheel = layouts.wheel(random.Random(42))
+>>> sorted(o.name for o in wheel.get(1))
+['1', 'Low', 'Odd', 'Red']
+>>> layouts.dice(random.Random(42)).getThrow(6, 6)
+Throw(6, 6)
+>>> len(layouts.deck), str(layouts.deck[0])
+(52, ' A♣')
+
+A snapshot from different builders is stale; a damaged file is corrupt.
+Either one is rebuilt.
+
+>>> data = path.read_bytes()
+>>> _ = path.write_bytes(data[:12] + bytes(32) + data[44:])
+>>> load(path)[1]
+'stale'
+>>> load(path)[1]
+'loaded'
+>>> _ = path.write_bytes(data[:-10])
+>>> load(path)[1]
+'corrupt'
+>>> load(path)[1]
+'loaded'
+>>> _ = path.write_bytes(b"")
+>>> load(path)[1]
+'corrupt'
+>>> junk = b"not a pickle"
+>>> _ = path.write_bytes(data[:44] + hashlib.sha256(junk).digest() + junk)
+>>> load(path)[1]
+'corrupt'
+>>> load(path)[1]
+'loaded'
+"""
+from functools import lru_cache
+import hashlib
+import inspect
+import mmap
+import os
+from pathlib import Path
+import pickle
+import random
+import struct
+import sys
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import blackjack
+import craps
+import roulette
+
+MAGIC = b"BSOODLAY"
+VERSION = 1
+HEADER = struct.Struct("<8sI32s32s")
+
+
+class Layouts:
+    """The built :class:`roulette.Bin`, :class:`craps.Throw` and :class:`blackjack.Card` instances."""
+
+    def __init__(
+        self,
+        bins: List[roulette.Bin],
+        outcomes: Dict[str, roulette.Outcome],
+        throws: List[craps.Throw],
+        deck: List[blackjack.Card],
+    ) -> None:
+        self.bins = bins
+        self.outcomes = outcomes
+        self.throws = throws
+        self.deck = deck
+
+    def wheel(self, rng: Optional[random.Random] = None) -> roulette.Wheel:
+        """A :class:`roulette.Wheel` that shares the prebuilt bins."""
+        wheel = roulette.Wheel(rng)
+        wheel.bins = self.bins
+        wheel.all_outcomes = self.outcomes
+        return wheel
+
+    def dice(self, rng: Optional[random.Random] = None) -> craps.Dice:
+        """A :class:`craps.Dice` that shares the prebuilt throws."""
+        dice = craps.Dice(rng)
+        for throw in self.throws:
+            dice.addThrow(throw)
+        return dice
+
+
+def build() -> Layouts:
+    wheel = roulette.Wheel()
+    roulette.BinBuilder().buildBins(wheel)
+    dice = craps.Dice()
+    craps.ThrowBuilder().buildThrows(dice)
+    deck = [
+        blackjack.card_factory(rank, suit)
+        for suit in (blackjack.Card.Clubs, blackjack.Card.Diamonds, blackjack.Card.Hearts, blackjack.Card.Spades)
+        for rank in range(1, 14)
+    ]
+    return Layouts(wheel.bins, wheel.all_outcomes, list(dice.throws.values()), deck)
+
+
+@lru_cache(maxsize=1)
+def fingerprint() -> bytes:
+    """A hash of the source files that determine the layouts."""
+    digest = hashlib.sha256()
+    for module in (roulette, craps, blackjack, sys.modules[__name__]):
+        source = inspect.getsourcefile(module)
+        if source is None:
+            raise RuntimeError(f"no source file for {module.__name__}")
+        digest.update(Path(source).read_bytes())
+    return digest.digest()
+
+
+def save(path: Path, layouts: Layouts) -> None:
+    """Write a snapshot atomically, so a reader never sees a partial file."""
+    payload = pickle.dumps(layouts, protocol=pickle.HIGHEST_PROTOCOL)
+    header = HEADER.pack(MAGIC, VERSION, fingerprint(), hashlib.sha256(payload).digest())
+    fd, temp = tempfile.mkstemp(dir=path.parent, prefix=path.name)
+    with os.fdopen(fd, "wb") as target:
+        target.write(header)
+        target.write(payload)
+    os.replace(temp, path)
+
+
+def _read(path: Path) -> Tuple[Optional[Layouts], str]:
+    if not path.exists():
+        return None, "missing"
+    if path.stat().st_size < HEADER.size:
+        return None, "corrupt"  # mmap can't map an empty file
+    with path.open("rb") as source, mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        magic, version, source_hash, payload_hash = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            return None, "corrupt"
+        if version != VERSION or source_hash != fingerprint():
+            return None, "stale"
+        with memoryview(data)[HEADER.size:] as payload:
+            if hashlib.sha256(payload).digest() != payload_hash:
+                return None, "corrupt"
+            try:
+                return pickle.loads(payload), "loaded"
+            except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError, TypeError, ValueError):
+                return None, "corrupt"
+
+
+def load(path: Path) -> Tuple[Layouts, str]:
+    """
+    Load the layouts from a snapshot.
+    If the snapshot is missing, stale, or corrupt, rebuild and save it.
+
+    :returns: the layouts and one of ``"loaded"``, ``"missing"``, ``"stale"``, or ``"corrupt"``.
+    """
+    layouts, status = _read(path)
+    if layouts is None:
+        layouts = build()
+        save(path, layouts)
+    return layouts, status
+
+
+_warm: Optional[Layouts] = None
+
+
+def warm(path: Path) -> Layouts:
+    """
+    Load the layouts once per process.
+    Call this in a server process before forking workers;
+    each forked worker inherits the loaded layouts.
+    """
+    global _warm
+    if _warm is None:
+        _warm, _ = load(path)
+    return _warm
@@ -0,0 +1,306 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+Memory accounting and a memory budget for long simulations.
+
+A :class:`roulette.Simulator` keeps every duration and maximum, and builds
+a list of stakes for each session. For a long run, that's a lot of memory.
+A :class:`BudgetedSimulator` samples :mod:`tracemalloc` and the resident
+set size at each session boundary; :meth:`BudgetedSimulator.gather` starts
+tracing if it isn't already running. When the memory allocated since
+the run started goes over the budget, or the resident set size goes over
+its own budget, it changes modes instead of failing:
+
+``stream``
+    Replace the lists of durations and maxima with a :class:`session_stats.Summary`
+    of each. The individual values are gone; the count, mean, standard
+    deviation, and maximum are exact.
+
+``spill``
+    Write the durations and maxima to a file, and keep appending to it.
+    :meth:`BudgetedSimulator.results` reads them back. This is only the
+    results of each session; for every bet and spin, use a
+    :class:`session_trace.TracingSimulator`.
+
+In either mode, :meth:`BudgetedSimulator.sessionSummary` keeps a running
+duration and maximum instead of a list of stakes.
+
+:func:`attribute` assigns each allocation site to a subsystem,
+using the class (or module) that contains the line of code:
+the wheel and bins, the players and bets, the statistics, or the shoe and cards.
+
+>>> import random, tempfile
+>>> from pathlib import Path
+>>> from layout_snapshot import build
+>>> from roulette import Game, Martingale, Table
+>>> table = Table(limit=300, minimum=1)
+>>> wheel = build().wheel(random.Random(42))
+>>> sim = BudgetedSimulator(Game(wheel, table), Martingale(table), budget=4096, samples=600)
+>>> sim.gather()
+>>> sim.mode, len(sim.durations), sim.summaries[0].count
+('stream', 0, 600)
+>>> sim.switched < 600
+True
+>>> [(r.mode, "statistics" in r.subsystems) for r in sim.readings]
+[('lists', True)]
+
+>>> spill = Path(tempfile.mkdtemp()) / "results.bin"
+>>> wheel.rng = random.Random(42)
+>>> spilled = BudgetedSimulator(Game(wheel, table), Martingale(table), budget=4096, samples=600, spill=spill)
+>>> spilled.gather()
+>>> spilled.mode, len(spilled.durations)
+('spill', 0)
+>>> durations, maxima = zip(*spilled.results())
+>>> len(durations), sum(durations) == sim.summaries[0].total, max(maxima) == sim.summaries[1].maximum
+(600, True, True)
+
+>>> wheel.rng = random.Random(42)
+>>> watched = BudgetedSimulator(Game(wheel, table), Martingale(table), budget=1 << 20, samples=200, attribution=100)
+>>> watched.gather()
+>>> [(r.session, r.mode, "statistics" in r.subsystems) for r in watched.readings]
+[(0, 'lists', True), (100, 'lists', True)]
+
+The resident set size has a budget, too, in KiB. Any process has more than 1 KiB.
+
+>>> wheel.rng = random.Random(42)
+>>> lean = BudgetedSimulator(Game(wheel, table), Martingale(table), budget=1 << 20, rssBudget=1, samples=20)
+>>> lean.gather()
+>>> lean.mode, lean.switched, lean.readings[0].rss > 1
+('stream', 1, True)
+"""
+import ast
+from array import array
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+import os
+from pathlib import Path
+import resource
+import sys
+import tracemalloc
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from roulette import Game, Player, Simulator
+from session_stats import Summary
+
+WHEEL, PLAYERS, STATISTICS, CARDS, OTHER = "wheel/bins", "players/bets", "statistics", "shoe/cards", "other"
+
+CLASSES = {
+    WHEEL: {"Wheel", "Bin", "BinBuilder", "Dice", "Throw", "ThrowBuilder", "Layouts"},
+    PLAYERS: {
+        "Player", "StrategyPlayer", "Martingale", "Player1326", "PlayerCancellation", "PlayerFibonacci",
+        "SevenReds", "PassLineOdds", "Bet", "CommissionBet", "BetPool", "Table", "Outcome",
+    },
+    STATISTICS: {"Simulator", "BudgetedSimulator", "TracingSimulator", "Summary", "Estimate", "EventHistory"},
+    CARDS: {"Card", "AceCard", "FaceCard", "Shoe", "CountingShoe", "Hand", "BlackjackGame"},
+}
+MODULES = {
+    "layout_snapshot": WHEEL,
+    "betting_strategy": PLAYERS,
+    "distributed": STATISTICS,
+    "session_stats": STATISTICS,
+    "session_trace": STATISTICS,
+    "variance_reduction": STATISTICS,
+    "memory_budget": STATISTICS,
+    "blackjack": CARDS,
+    "shoe_counter": CARDS,
+    "batch_blackjack": CARDS,
+    "blackjack_ev": CARDS,
+}
+SUBSYSTEM = {name: subsystem for subsystem, names in CLASSES.items() for name in names}
+HERE = Path(__file__).parent
+
+
+@contextmanager
+def tracing(frames: int = 1) -> Iterator[None]:
+    """Trace allocations within the ``with`` statement, unless they're already being traced."""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(frames)
+    try:
+        yield
+    finally:
+        if started:
+            tracemalloc.stop()
+
+
+def rss() -> int:
+    """The current resident set size in KiB; the peak, where the current size isn't available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        scale = 1024 if sys.platform == "darwin" else 1
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale
+
+
+@lru_cache(maxsize=None)
+def _classes(filename: str) -> List[Tuple[int, int, str]]:
+    """The line ranges of the classes in a module, innermost last."""
+    try:
+        tree = ast.parse(Path(filename).read_text())
+    except (OSError, SyntaxError, ValueError):
+        return []
+    return sorted(
+        (node.lineno, node.end_lineno or node.lineno, node.name)
+        for node in ast.walk(tree)
+        if isinstance(node, ast.ClassDef)
+    )
+
+
+def subsystem(filename: str, lineno: int) -> str:
+    """
+    The subsystem for a line of code in this directory: from the class that contains it,
+    or else the module. Library code is ``"other"``.
+
+    >>> import roulette
+    >>> subsystem(roulette.__file__, roulette.BetPool.acquire.__code__.co_firstlineno + 1)
+    'players/bets'
+    >>> subsystem(roulette.__file__, roulette.Simulator.session.__code__.co_firstlineno + 1)
+    'statistics'
+    """
+    if Path(filename).parent != HERE:
+        return OTHER
+    for first, last, name in reversed(_classes(filename)):
+        if first <= lineno <= last and name in SUBSYSTEM:
+            return SUBSYSTEM[name]
+    return MODULES.get(Path(filename).stem, OTHER)
+
+
+def attribute(snapshot: tracemalloc.Snapshot, baseline: Optional[tracemalloc.Snapshot] = None) -> Dict[str, int]:
+    """Bytes allocated by each subsystem, or the change since ``baseline``; :mod:`tracemalloc` itself is left out."""
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    snapshot = snapshot.filter_traces(ignore)
+    baseline = baseline.filter_traces(ignore) if baseline else None
+    stats = snapshot.compare_to(baseline, "lineno") if baseline else snapshot.statistics("lineno")
+    totals: Dict[str, int] = {}
+    for stat in stats:
+        frame = stat.traceback[0]
+        name = subsystem(frame.filename, frame.lineno)
+        size = stat.size_diff if isinstance(stat, tracemalloc.StatisticDiff) else stat.size
+        totals[name] = totals.get(name, 0) + size
+    return totals
+
+
+@dataclass
+class Sample:
+    """Memory at a session boundary: bytes allocated since the run started, and RSS in KiB."""
+
+    session: int
+    traced: int
+    rss: int
+    mode: str
+    subsystems: Dict[str, int] = field(default_factory=dict)
+
+
+class BudgetedSimulator(Simulator):
+    """
+    A :class:`roulette.Simulator` that keeps the memory it allocates under ``budget`` bytes,
+    and, if ``rssBudget`` is given, its resident set size under ``rssBudget`` KiB.
+    Over either budget, it spills to ``spill`` if that's given, and streams summaries otherwise.
+    A :class:`Sample`, with the bytes for each subsystem, is taken when the mode
+    changes, and every ``attribution`` sessions if that's not zero.
+    """
+
+    def __init__(
+        self,
+        game: Game,
+        player: Player,
+        budget: int,
+        spill: Optional[Path] = None,
+        attribution: int = 0,
+        rssBudget: Optional[int] = None,
+        **kwargs: int,
+    ) -> None:
+        super().__init__(game, player, **kwargs)
+        self.budget = budget
+        self.rssBudget = rssBudget
+        self.spill = spill
+        self.attribution = attribution
+        self.mode = "lists"
+        self.switched: Optional[int] = None
+        self.summaries = (Summary(), Summary())
+        self.readings: List[Sample] = []
+        self._pending = array("q")
+
+    def sessionSummary(self) -> Tuple[int, int]:
+        """One session, without the list of stake values: its duration and maximum stake."""
+        player = self.player
+        self.game.reset()
+        player.reset(self.initDuration, self.initStake)
+        duration, maximum = 0, self.initStake
+        while player.playing():
+            self.game.cycle(player)
+            duration += 1
+            maximum = max(maximum, player.stake) if duration > 1 else player.stake
+        return duration, maximum
+
+    def gather(self) -> None:
+        with tracing():
+            self._gather()
+
+    def _gather(self) -> None:
+        for module in list(sys.modules.values()):
+            filename = getattr(module, "__file__", None)
+            if filename and Path(filename).parent == HERE:
+                _classes(filename)  # parse now, so parsing isn't attributed to the run
+        baseline = tracemalloc.take_snapshot()
+        base, _ = tracemalloc.get_traced_memory()
+        for number in range(self.samples):
+            if self.mode == "lists":
+                stakes = self.session()
+                self.durations.append(len(stakes))
+                self.maxima.append(max(stakes, default=self.initStake))
+            else:
+                self.record(*self.sessionSummary())
+            traced = tracemalloc.get_traced_memory()[0] - base
+            resident = rss()
+            over = self.mode == "lists" and (
+                traced > self.budget or (self.rssBudget is not None and resident > self.rssBudget)
+            )
+            if over or (self.attribution and number % self.attribution == 0):
+                subsystems = attribute(tracemalloc.take_snapshot(), baseline)
+                self.readings.append(Sample(number, traced, resident, self.mode, subsystems))
+            if over:
+                self.switch(number + 1)
+        self.flush()
+
+    def switch(self, session: int) -> None:
+        """Leave the lists behind: summarize them, or write them to the spill file."""
+        self.switched = session
+        if self.spill is not None:
+            self.mode = "spill"
+            self.spill.write_bytes(b"")
+            for pair in zip(self.durations, self.maxima):
+                self._pending.extend(pair)
+            self.flush()
+        else:
+            self.mode = "stream"
+            for durations, maximum in zip(self.durations, self.maxima):
+                self.summaries[0].add(durations)
+                self.summaries[1].add(maximum)
+        self.durations, self.maxima = [], []
+
+    def record(self, duration: int, maximum: int) -> None:
+        if self.mode == "spill":
+            self._pending.extend((duration, maximum))
+            if len(self._pending) >= 8192:
+                self.flush()
+        else:
+            self.summaries[0].add(duration)
+            self.summaries[1].add(maximum)
+
+    def flush(self) -> None:
+        if self.spill is not None and self._pending:
+            with self.spill.open("ab") as target:
+                self._pending.tofile(target)
+            del self._pending[:]
+
+    def results(self) -> Iterator[Tuple[int, int]]:
+        """Each session's duration and maximum, from the spill file, then the lists."""
+        if self.mode == "spill" and self.spill is not None:
+            with self.spill.open("rb") as source:
+                while chunk := source.read(64 * 1024):
+                    values = array("q", chunk)
+                    yield from zip(values[0::2], values[1::2])
+        yield from zip(self.durations, self.maxima)
@@ -0,0 +1,63 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+Summary statistics for simulation results, shared by the runners.
+
+A :class:`Summary` keeps a count, a sum, a sum of squares, and a maximum,
+all exact integers. It needs no list of the values, and two summaries
+merge into the summary of all their values.
+"""
+from dataclasses import dataclass
+import math
+
+
+@dataclass
+class Summary:
+    """
+    Exact integer sums, so partial summaries merge in any order
+    with identical results.
+
+    >>> a, b = Summary(), Summary()
+    >>> for x in (1, 2, 3): a.add(x)
+    >>> for x in (4, 5): b.add(x)
+    >>> a.merge(b)
+    >>> a.count, a.mean(), round(a.stdev(), 4), a.maximum
+    (5, 3.0, 1.5811, 5)
+    """
+
+    count: int = 0
+    total: int = 0
+    total_sq: int = 0
+    maximum: int = 0
+
+    def add(self, value: int) -> None:
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other: "Summary") -> None:
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.maximum = max(self.maximum, other.maximum)
+
+    def mean(self) -> float:
+        """The mean; NaN with no values."""
+        if self.count == 0:
+            return math.nan
+        return self.total / self.count
+
+    def stdev(self) -> float:
+        """
+        The sample standard deviation; NaN with fewer than two values.
+
+        >>> one = Summary()
+        >>> one.add(7)
+        >>> one.mean(), one.stdev(), Summary().mean()
+        (7.0, nan, nan)
+        """
+        n = self.count
+        if n < 2:
+            return math.nan
+        return math.sqrt((n * self.total_sq - self.total ** 2) / (n * (n - 1)))
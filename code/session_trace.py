@@ -0,0 +1,382 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+Session traces: a compact binary log of every cycle of every session.
+
+The :meth:`Simulator.session` method builds a :class:`list` of stake values,
+which is then reduced to a maximum and a duration. A :class:`TracingSimulator`
+keeps only the running maximum and duration; the full history goes to a
+:class:`TraceWriter`.
+
+A trace is a sequence of unsigned varints (7 bits per byte, high bit set
+on all but the last byte). Each event is a tag followed by its values.
+Stake changes are written as zigzag-encoded deltas, so small wins and
+losses take a single byte.
+
+The :func:`replay` generator reads a trace back, one event at a time.
+A :class:`TracingCrapsGame` writes the throws of the dice in the same format.
+
+>>> import io, random
+>>> from roulette import BinBuilder, Martingale, Table, Wheel
+>>> wheel = Wheel(random.Random(42))
+>>> BinBuilder().buildBins(wheel)
+>>> table = Table(limit=300, minimum=1)
+>>> log = io.BytesIO()
+>>> with TraceWriter(log) as trace:
+...     sim = TracingSimulator(TracingGame(wheel, table, trace), Martingale(table), trace, samples=5)
+...     sim.gather()
+>>> sim.durations
+[105, 250, 56, 10, 173]
+>>> sim.maxima
+[153, 217, 131, 104, 184]
+>>> round(len(log.getvalue()) / sum(sim.durations), 1)
+7.1
+
+>>> log.seek(0)
+0
+>>> events = replay(log)
+>>> for e in list(islice(events, 6)):
+...     print(e)
+Session(number=0, stake=100)
+BetPlaced(outcome='Black', amount=1)
+Spin(number=7)
+Stake(delta=-1, stake=99)
+BetPlaced(outcome='Black', amount=2)
+Spin(number=1)
+>>> log.seek(0)
+0
+>>> summarize(replay(log))
+[(105, 153), (250, 217), (56, 131), (10, 104), (173, 184)]
+
+:meth:`TracingSimulator.session` still returns the stake values, like any
+:class:`Simulator`; :meth:`TracingSimulator.sessionSummary` doesn't build the list.
+
+>>> with TraceWriter(io.BytesIO()) as trace:
+...     sim = TracingSimulator(TracingGame(wheel, table, trace), Martingale(table), trace)
+...     stakes = sim.session()
+...     duration, maximum = sim.sessionSummary()
+>>> len(stakes) > 0, duration > 0
+(True, True)
+
+Craps sessions are traced the same way; each throw is a :class:`Spin`.
+
+>>> dice = craps.Dice(random.Random(42))
+>>> craps.ThrowBuilder().buildThrows(dice)
+>>> table = craps.Table(limit=craps.cents(300), minimum=craps.cents(5))
+>>> log = io.BytesIO()
+>>> with TraceWriter(log) as trace:
+...     player = craps.PassLineOdds(table, craps.cents(5), multiple=2)
+...     sim = TracingSimulator(TracingCrapsGame(dice, table, trace), player, trace, initStake=craps.cents(100), samples=5)
+...     sim.gather()
+>>> _ = log.seek(0)
+>>> summarize(replay(log)) == list(zip(sim.durations, sim.maxima))
+True
+>>> _ = log.seek(0)
+>>> [e for e in islice(replay(log), 4)]
+[Session(number=0, stake=10000), BetPlaced(outcome='Pass Line', amount=500), Spin(number=7), Stake(delta=-500, stake=9500)]
+
+A trace cut short raises :exc:`ValueError`.
+
+>>> list(replay(io.BytesIO(log.getvalue()[:8])))  # doctest: +IGNORE_EXCEPTION_DETAIL
+Traceback (most recent call last):
+...
+ValueError: truncated trace
+"""
+from itertools import islice
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import craps
+from roulette import Game, Outcome, Player, SessionGame, SessionPlayer, Simulator, Table, Wheel
+
+MAGIC = b"BSOODT"
+VERSION = 1
+
+# Event tags
+SESSION, OUTCOME, BET, SPIN, STAKE, END = range(6)
+
+
+class Session(NamedTuple):
+    number: int
+    stake: int
+
+
+class BetPlaced(NamedTuple):
+    outcome: str
+    amount: int
+
+
+class Spin(NamedTuple):
+    """The number of the bin chosen, or of the throw: ``(d1 - 1) * 6 + (d2 - 1)``."""
+
+    number: int
+
+
+class Stake(NamedTuple):
+    delta: int
+    stake: int
+
+
+class End(NamedTuple):
+    pass
+
+
+Event = Union[Session, BetPlaced, Spin, Stake, End]
+
+
+def zigzag(n: int) -> int:
+    """
+    Map signed to unsigned so small magnitudes stay small.
+
+    >>> [zigzag(n) for n in (0, -1, 1, -2, 2)]
+    [0, 1, 2, 3, 4]
+    >>> [unzigzag(zigzag(n)) for n in (0, -1, 1, -1000, 1000)]
+    [0, -1, 1, -1000, 1000]
+    """
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def unzigzag(n: int) -> int:
+    return n >> 1 if n & 1 == 0 else -((n + 1) >> 1)
+
+
+class TraceWriter:
+    """
+    Buffers varint-encoded events and writes them to a binary file.
+
+    >>> import io
+    >>> w = TraceWriter(io.BytesIO())
+    >>> w.varint(1), w.varint(300)
+    (None, None)
+    >>> bytes(w.buffer[-3:])
+    b'\\x01\\xac\\x02'
+    """
+
+    def __init__(self, file: BinaryIO, buffer_size: int = 64 * 1024) -> None:
+        self.file = file
+        self.buffer_size = buffer_size
+        self.buffer = bytearray(MAGIC)
+        self.outcomes: Dict[Union[Outcome, craps.Outcome], int] = {}
+        self.stake = 0
+        self.varint(VERSION)
+
+    def varint(self, n: int) -> None:
+        buffer = self.buffer
+        while n > 0x7F:
+            buffer.append((n & 0x7F) | 0x80)
+            n >>= 7
+        buffer.append(n)
+
+    def session(self, number: int, stake: int) -> None:
+        self.stake = stake
+        self.varint(SESSION)
+        self.varint(number)
+        self.varint(stake)
+
+    def bet(self, outcome: Union[Outcome, craps.Outcome], amount: int) -> None:
+        index = self.outcomes.get(outcome)
+        if index is None:
+            index = self.outcomes[outcome] = len(self.outcomes)
+            name = outcome.name.encode("utf-8")
+            self.varint(OUTCOME)
+            self.varint(len(name))
+            for b in name:
+                self.varint(b)
+        self.varint(BET)
+        self.varint(index)
+        self.varint(amount)
+
+    def spin(self, number: int) -> None:
+        self.varint(SPIN)
+        self.varint(number)
+
+    def stakeIs(self, stake: int) -> None:
+        self.varint(STAKE)
+        self.varint(zigzag(stake - self.stake))
+        self.stake = stake
+
+    def end(self) -> None:
+        self.varint(END)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self.file.write(self.buffer)
+        self.buffer.clear()
+
+    def __enter__(self) -> "TraceWriter":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.flush()
+
+
+def _varints(file: BinaryIO, chunk_size: int = 64 * 1024) -> Iterator[int]:
+    value = shift = 0
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        for b in chunk:
+            value |= (b & 0x7F) << shift
+            if b & 0x80:
+                shift += 7
+            else:
+                yield value
+                value = shift = 0
+    if shift:
+        raise ValueError("truncated trace")
+
+
+def _next(ints: Iterator[int]) -> int:
+    try:
+        return next(ints)
+    except StopIteration:
+        raise ValueError("truncated trace") from None
+
+
+def replay(file: BinaryIO) -> Iterator[Event]:
+    """
+    Lazily decode the events in a trace file.
+    A trace that ends in the middle of an event raises :exc:`ValueError`.
+
+    >>> import io
+    >>> list(replay(io.BytesIO(MAGIC)))  # doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+    ...
+    ValueError: truncated trace
+    """
+    if file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not a session trace")
+    ints = _varints(file)
+    version = _next(ints)
+    if version != VERSION:
+        raise ValueError(f"unsupported trace version {version}")
+    names: List[str] = []
+    stake = 0
+    for tag in ints:
+        if tag == STAKE:
+            delta = unzigzag(_next(ints))
+            stake += delta
+            yield Stake(delta, stake)
+        elif tag == SPIN:
+            yield Spin(_next(ints))
+        elif tag == BET:
+            yield BetPlaced(names[_next(ints)], _next(ints))
+        elif tag == SESSION:
+            number, stake = _next(ints), _next(ints)
+            yield Session(number, stake)
+        elif tag == END:
+            yield End()
+        elif tag == OUTCOME:
+            size = _next(ints)
+            name = bytes(islice(ints, size))
+            if len(name) < size:
+                raise ValueError("truncated trace")
+            names.append(name.decode("utf-8"))
+        else:
+            raise ValueError(f"unknown event tag {tag}")
+
+
+def summarize(events: Iterator[Event]) -> List[Tuple[int, int]]:
+    """The duration and maximum stake of each session in a stream of events."""
+    sessions = []
+    duration = maximum = initial = 0
+    for event in events:
+        if isinstance(event, Stake):
+            duration += 1
+            maximum = max(maximum, event.stake)
+        elif isinstance(event, Session):
+            duration, maximum, initial = 0, 0, event.stake
+        elif isinstance(event, End):
+            sessions.append((duration, maximum if duration else initial))
+    return sessions
+
+
+class TracingGame(Game):
+    """A :class:`Game` which writes the bets and the spins to a trace."""
+
+    def __init__(self, wheel: Wheel, table: Table, trace: TraceWriter) -> None:
+        super().__init__(wheel, table)
+        self.trace = trace
+
+    def cycle(self, player: Player) -> None:
+        if not player.playing():
+            return
+        player.placeBets()
+        self.table.isValid()
+        for bet in self.table.bets:
+            self.trace.bet(bet.outcome, bet.amountBet)
+        winners = self.wheel.choose()
+        self.trace.spin(self.wheel.last)
+        self.resolve(player, winners)
+
+
+class TracingCrapsGame(craps.CrapsGame):
+    """A :class:`craps.CrapsGame` which writes each new bet and each throw to a trace."""
+
+    def __init__(self, dice: craps.Dice, table: craps.Table, trace: TraceWriter) -> None:
+        super().__init__(dice, table)
+        self.trace = trace
+        self.traced = 0
+
+    def roll(self) -> craps.Throw:
+        bets = self.table.bets
+        for bet in bets[self.traced:]:
+            self.trace.bet(bet.outcome, bet.amountBet)
+        self.traced = len(bets)
+        throw = super().roll()
+        self.trace.spin((throw.d1 - 1) * 6 + throw.d2 - 1)
+        return throw
+
+    def resolve(self, player: craps.Player, throw: craps.Throw, won: bool) -> None:
+        super().resolve(player, throw, won)
+        self.traced = 0
+
+    def reset(self) -> None:
+        super().reset()
+        self.traced = 0
+
+
+class TracingSimulator(Simulator):
+    """
+    A :class:`Simulator` that writes each session to a trace
+    instead of keeping the list of stake values.
+    """
+
+    def __init__(self, game: SessionGame, player: SessionPlayer, trace: TraceWriter, **kwargs: int) -> None:
+        super().__init__(game, player, **kwargs)
+        self.trace = trace
+        self.sessions = 0
+
+    def session(self) -> List[int]:
+        """One traced session; the stake values, as :meth:`Simulator.session` returns them."""
+        stakes: List[int] = []
+        self._play(stakes)
+        return stakes
+
+    def sessionSummary(self) -> Tuple[int, int]:
+        """One traced session, without the list of stake values: its duration and maximum stake."""
+        return self._play(None)
+
+    def _play(self, stakes: Optional[List[int]]) -> Tuple[int, int]:
+        player, trace = self.player, self.trace
+        self.game.reset()
+        player.reset(self.initDuration, self.initStake)
+        trace.session(self.sessions, player.stake)
+        self.sessions += 1
+        duration, maximum = 0, 0
+        while player.playing():
+            self.game.cycle(player)
+            trace.stakeIs(player.stake)
+            if stakes is not None:
+                stakes.append(player.stake)
+            duration += 1
+            maximum = max(maximum, player.stake)
+        trace.end()
+        return duration, maximum if duration else self.initStake
+
+    def gather(self) -> None:
+        for _ in range(self.samples):
+            duration, maximum = self.sessionSummary()
+            self.durations.append(duration)
+            self.maxima.append(maximum)
@@ -0,0 +1,143 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+A Blackjack :class:`Shoe` that keeps count of the cards it has dealt.
+
+Each dealt card updates a per-rank count of the cards remaining,
+the total remaining, and the running count for each of a number of
+card-counting systems. Each update is a fixed amount of work;
+nothing is rescanned and no lists are copied.
+A strategy can query these values at any time.
+
+>>> shoe = CountingShoe(decks=2, rng=random.Random(42), systems=(HI_LO, KO))
+>>> shoe.shuffle()
+>>> dealer = iter(shoe)
+>>> hand = [next(dealer) for _ in range(10)]
+>>> [str(c) for c in hand]
+[' A♢', ' 4♠', ' 3♢', '10♣', ' 8♠', ' 7♣', ' 2♣', ' 9♢', ' K♡', ' K♠']
+>>> shoe.remaining
+94
+>>> shoe.remainingOf(Card.King)
+6
+>>> shoe.runningCount("Hi-Lo"), shoe.runningCount("KO")
+(-1, -4)
+>>> round(shoe.trueCount("Hi-Lo"), 3)
+-0.553
+"""
+from dataclasses import dataclass
+from itertools import islice
+import random
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from blackjack import Card, card_factory
+
+
+@dataclass(frozen=True)
+class CountSystem:
+    """
+    A card-counting system.
+    The ``tags`` are the count values for Ace, 2, ..., 9, and ten-valued cards.
+    An unbalanced system starts at ``irc_per_deck`` times the number
+    of decks, offset by ``irc_offset``.
+    """
+
+    name: str
+    tags: Tuple[int, ...]
+    irc_per_deck: int = 0
+    irc_offset: int = 0
+
+    def initialCount(self, decks: int) -> int:
+        return self.irc_per_deck * decks + self.irc_offset
+
+    def tag(self, card: Card) -> int:
+        return self.tags[card.hardValue - 1]
+
+
+HI_LO = CountSystem("Hi-Lo", (-1, 1, 1, 1, 1, 1, 0, 0, 0, -1))
+KO = CountSystem("KO", (-1, 1, 1, 1, 1, 1, 1, 0, 0, -1), irc_per_deck=-4, irc_offset=4)
+OMEGA_II = CountSystem("Omega II", (0, 1, 1, 2, 2, 2, 1, 0, -1, -2))
+
+
+class CountingShoe:
+    """
+    A shoe of one or more decks, tracking the composition of the undealt cards.
+
+    ..  attribute:: rankCounts
+
+        The number of undealt cards of each rank, indexed by rank 1 to 13.
+        This is the live list; clients must not update it.
+    """
+
+    def __init__(
+        self,
+        decks: int,
+        stopDeal: int = 1,
+        rng: Optional[random.Random] = None,
+        systems: Iterable[CountSystem] = (HI_LO,),
+    ) -> None:
+        self.decks = decks
+        self.stopDeal = stopDeal
+        self.rng = rng or random.Random()
+        self.systems = tuple(systems)
+        self.cards = [
+            card_factory(rank, suit)
+            for _ in range(decks)
+            for suit in (Card.Clubs, Card.Diamonds, Card.Hearts, Card.Spades)
+            for rank in range(1, 14)
+        ]
+        self._index = {s.name: i for i, s in enumerate(self.systems)}
+        self.rankCounts: List[int] = [0] * 14
+        self.running: List[int] = [0] * len(self.systems)
+        self.remaining = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """All cards are back in the shoe."""
+        for rank in range(1, 14):
+            self.rankCounts[rank] = 4 * self.decks
+        for i, s in enumerate(self.systems):
+            self.running[i] = s.initialCount(self.decks)
+        self.remaining = len(self.cards)
+
+    def shuffle(self) -> None:
+        self.rng.shuffle(self.cards)
+        self.reset()
+
+    def dealt(self, card: Card) -> None:
+        """Update the counts for one card leaving the shoe."""
+        self.rankCounts[card.rank] -= 1
+        self.remaining -= 1
+        value = card.hardValue - 1
+        running = self.running
+        for i, s in enumerate(self.systems):
+            running[i] += s.tags[value]
+
+    def __iter__(self) -> Iterator[Card]:
+        """
+        Deal cards, leaving approximately :obj:`stopDeal` decks undealt.
+        Each pass starts from the top of the shoe, with all the cards counted as undealt.
+        """
+        self.reset()
+        adjustment = self.rng.randint(-6, 6)
+        stop = max(len(self.cards) - (self.stopDeal * 52 + adjustment), 0)
+        for card in islice(self.cards, stop):
+            self.dealt(card)
+            yield card
+
+    def remainingOf(self, rank: int) -> int:
+        return self.rankCounts[rank]
+
+    def runningCount(self, name: str = "Hi-Lo") -> int:
+        return self.running[self._index[name]]
+
+    def decksRemaining(self) -> float:
+        return self.remaining / 52
+
+    def trueCount(self, name: str = "Hi-Lo") -> float:
+        """The running count per deck remaining; 0 for an empty shoe."""
+        if self.remaining == 0:
+            return 0.0
+        return self.running[self._index[name]] / (self.remaining / 52)
+
+    def counts(self) -> Dict[str, int]:
+        return {s.name: self.running[i] for i, s in enumerate(self.systems)}
@@ -0,0 +1,33 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+The batch evaluator agrees with the object-based game.
+"""
+import random
+from batch_blackjack import BASIC, BlackjackGame, BlackjackPlayer, encode, playShoe
+from shoe_counter import CountingShoe
+
+
+def test_batch_matches_objects():
+    rng = random.Random(2019)
+    player = BlackjackPlayer(BASIC)
+    for decks in (1, 2, 6, 8):
+        shoe = CountingShoe(decks=decks, rng=rng)
+        for _ in range(50):
+            shoe.shuffle()
+            cut = len(shoe.cards) - rng.randint(26, 52)
+            game = BlackjackGame(shoe.cards, cut, player)
+            expected = [game.cycle() for _ in game.rounds()]
+            assert playShoe(encode(shoe.cards), cut, BASIC).tolist() == expected
+
+
+def test_cut_at_the_end_of_the_shoe():
+    rng = random.Random(2020)
+    player = BlackjackPlayer(BASIC)
+    shoe = CountingShoe(decks=1, rng=rng)
+    for _ in range(50):
+        shoe.shuffle()
+        game = BlackjackGame(shoe.cards, len(shoe.cards), player)
+        expected = [game.cycle() for _ in game.rounds()]
+        assert game.position <= len(shoe.cards)
+        assert playShoe(encode(shoe.cards), len(shoe.cards), BASIC).tolist() == expected
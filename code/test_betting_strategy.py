@@ -0,0 +1,85 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+The compiled strategies bet the same amounts as the book's direct implementations.
+"""
+import random
+from betting_strategy import CancellationBetting, CompiledBetting, fibonacci, martingale, oneThreeTwoSix
+
+LIMIT = 300
+
+
+class Reference:
+    """The systems as described in the book, with ordinary attributes."""
+
+    def __init__(self, name):
+        self.name = name
+        self.martingale, self.wins, self.sequence = 1, 0, [1, 2, 3, 4, 5, 6]
+        self.recent, self.previous = 1, 0
+
+    def amount(self):
+        if self.name == "martingale":
+            return self.martingale
+        if self.name == "1-3-2-6":
+            return (1, 3, 2, 6)[self.wins]
+        if self.name == "fibonacci":
+            return self.recent
+        s = self.sequence
+        return s[0] + s[-1] if len(s) > 1 else s[0]
+
+    def win(self):
+        self.martingale = 1
+        self.wins = (self.wins + 1) % 4
+        self.recent, self.previous = 1, 0
+        self.sequence = self.sequence[1:-1] or [1, 2, 3, 4, 5, 6]
+
+    def lose(self):
+        amount = self.amount()
+        self.martingale *= 2
+        self.wins = 0
+        self.recent, self.previous = self.recent + self.previous, self.recent
+        self.sequence.append(amount)
+
+
+def strategies():
+    yield "martingale", CompiledBetting(martingale(LIMIT), "Black")
+    yield "1-3-2-6", CompiledBetting(oneThreeTwoSix(LIMIT), "Black")
+    yield "fibonacci", CompiledBetting(fibonacci(LIMIT), "Black")
+    yield "cancellation", CancellationBetting("Black", capacity=8)
+
+
+def test_matches_reference():
+    rng = random.Random(5)
+    for name, strategy in strategies():
+        for _ in range(200):
+            reference = Reference(name)
+            strategy.reset()
+            for _ in range(250):
+                if reference.amount() > LIMIT:
+                    break
+                assert strategy.amount() == reference.amount(), name
+                if rng.random() < 18 / 38:
+                    strategy.win(None)
+                    reference.win()
+                else:
+                    strategy.lose(None)
+                    reference.lose()
+            assert strategy.amount() == reference.amount(), name
+
+
+def test_snapshot_restores_the_same_future():
+    rng = random.Random(6)
+    for name, strategy in strategies():
+        for _ in range(5):
+            strategy.lose(None)
+        saved = strategy.snapshot()
+        results = [rng.random() < 0.5 for _ in range(20)]
+        amounts = []
+        for _ in range(2):
+            strategy.restore(saved)
+            played = []
+            for won in results:
+                played.append(strategy.amount())
+                strategy.win(None) if won else strategy.lose(None)
+            amounts.append(played)
+        assert amounts[0] == amounts[1], name
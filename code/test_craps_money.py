@@ -0,0 +1,105 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+The fixed-point payouts match the book's :class:`fractions.Fraction` odds,
+rounded down to the cent.
+"""
+from fractions import Fraction
+import math
+import random
+import pytest
+from craps import Bet, CrapsGame, Dice, InvalidBet, PassLineOdds, Table, ThrowBuilder, cents
+from roulette import Simulator
+
+BOOK_ODDS = {
+    "Number 2": Fraction(30),
+    "Number 3": Fraction(15),
+    "Number 7": Fraction(4),
+    "Number 11": Fraction(15),
+    "Number 12": Fraction(30),
+    "Any Craps": Fraction(7),
+    "Horn": Fraction(27, 4),
+    "Field": Fraction(1),
+    "Pass Line": Fraction(1),
+    "Pass Odds 4": Fraction(2),
+    "Pass Odds 5": Fraction(3, 2),
+    "Pass Odds 6": Fraction(6, 5),
+    "Pass Odds 8": Fraction(6, 5),
+    "Pass Odds 9": Fraction(3, 2),
+    "Pass Odds 10": Fraction(2),
+}
+
+
+def book_win(name, amount, total):
+    if name == "Field" and total in (2, 12):
+        return amount * Fraction(2)
+    if name == "Horn" and total in (3, 11):
+        return amount * Fraction(3)
+    return amount * BOOK_ODDS[name]
+
+
+def test_propositions_match_fractions():
+    dice = Dice()
+    ThrowBuilder().buildThrows(dice)
+    for throw in dice.throws.values():
+        for outcome in throw.outcomes:
+            for amount in range(1, 5000, 7):
+                exact = book_win(outcome.name, amount, throw.total)
+                assert outcome.winAmount(amount, throw) == math.floor(exact)
+
+
+def test_sessions_match_fractions():
+    table = Table(limit=cents(300), minimum=cents(5))
+    game = CrapsGame(Dice(random.Random(8)), table)
+    ThrowBuilder().buildThrows(game.dice)
+    checked = []
+
+    class Checked(PassLineOdds):
+        def win(self, bet: Bet, throw) -> None:
+            exact = bet.amountBet + book_win(bet.outcome.name, bet.amountBet, throw.total)
+            assert bet.winAmount(throw) == math.floor(exact)
+            checked.append(exact.denominator == 1)
+            super().win(bet, throw)
+
+    player = Checked(table, cents(5), multiple=3)
+    for _ in range(50):
+        player.reset(250, cents(100))
+        while player.playing():
+            game.cycle(player)
+    assert len(checked) > 1000 and all(checked)
+
+
+def test_odds_stay_within_the_table_limit():
+    table = Table(limit=cents(300), minimum=cents(5))
+    game = CrapsGame(Dice(random.Random(9)), table)
+    ThrowBuilder().buildThrows(game.dice)
+    player = PassLineOdds(table, cents(100), multiple=3)
+    sim = Simulator(game, player, initStake=cents(1000), samples=20)
+    sim.gather()
+    assert len(sim.durations) == 20
+
+
+def test_bets_below_the_minimum_are_invalid():
+    table = Table(limit=cents(300), minimum=cents(5))
+    game = CrapsGame(Dice(), table)
+    table.placeBet(Bet(cents(4), game.passLine))
+    with pytest.raises(InvalidBet):
+        table.isValid()
+
+
+def test_session_starts_on_a_come_out_roll():
+    table = Table(limit=cents(300), minimum=cents(5))
+    game = CrapsGame(Dice(random.Random(10)), table)
+    ThrowBuilder().buildThrows(game.dice)
+    points = []
+
+    class Watching(PassLineOdds):
+        def placeBets(self, game):
+            points.append(game.point)
+            super().placeBets(game)
+
+    sim = Simulator(game, Watching(table, cents(5)), initStake=cents(100), samples=1)
+    game.point = 6
+    table.placeBet(Bet(cents(5), game.passLine))
+    sim.session()
+    assert points[0] == 0
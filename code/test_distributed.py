@@ -0,0 +1,93 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+The distributed runner matches a serial run, with retries and work stealing.
+"""
+import contextlib
+import io
+import socket
+import time
+import pytest
+from distributed import Summary, WorkBoard, coordinate, runSessions
+
+
+@pytest.fixture(scope="module")
+def serial():
+    return runSessions(0, 120, seed=7)
+
+
+def test_matches_serial(serial):
+    report = coordinate(120, local=3, batch=10, seed=7, timeout=60)
+    assert (report["durations"], report["maxima"]) == serial
+    assert report["retried"] == 0
+
+
+def test_idle_worker_steals(serial):
+    report = coordinate(120, local=1, queues=4, batch=10, seed=7, timeout=60)
+    assert (report["durations"], report["maxima"]) == serial
+    assert report["stolen"] >= 6
+
+
+def test_failed_shards_retried(serial):
+    report = coordinate(120, local=2, batch=10, seed=7, chaos=frozenset({1, 4}), timeout=60)
+    assert (report["durations"], report["maxima"]) == serial
+    assert report["retried"] == 2
+
+
+def test_crashed_worker_lease_expires(serial):
+    report = coordinate(120, local=1, crashers=1, batch=10, seed=7, lease=0.5, timeout=60)
+    assert (report["durations"], report["maxima"]) == serial
+    assert report["retried"] >= 1
+
+
+def test_attempts_exhausted():
+    board = WorkBoard([(0, 10)], queues=1, max_attempts=2)
+    for attempt in range(2):
+        number, tried, first, last = board.take(0)
+        assert (number, tried) == (0, attempt)
+        board.fail(number, tried, "boom")
+    assert board.report()["failed"] == {0: "boom"}
+    assert board.finished()
+    assert board.take(0) is None
+
+
+def test_late_completion_after_attempts_exhausted():
+    board = WorkBoard([(0, 10), (1, 20)], queues=1, max_attempts=1, lease=0.01)
+    slow = board.take(0)
+    time.sleep(0.02)
+    other = board.take(0)
+    assert board.report()["failed"] == {0: "lease expired"}
+    board.complete(slow[0], Summary(), Summary())
+    board.complete(other[0], Summary(), Summary())
+    assert board.finished()
+    assert board.report()["failed"] == {}
+
+
+def test_renewed_lease_does_not_expire():
+    board = WorkBoard([(0, 10)], queues=1, lease=0.05)
+    number, attempt, _, _ = board.take(0)
+    for _ in range(4):
+        time.sleep(0.03)
+        assert board.renew(number, attempt)
+    assert not board.finished()
+    assert board.report()["retried"] == 0
+    assert not board.renew(number, attempt + 1)
+
+
+def test_remote_coordinator_needs_authkey(monkeypatch):
+    monkeypatch.delenv("SIM_AUTHKEY", raising=False)
+    with pytest.raises(ValueError):
+        coordinate(10, local=0, bind="0.0.0.0", timeout=1)
+
+
+def test_coordinator_leaves_no_server_behind():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    captured = io.StringIO()
+    with contextlib.redirect_stdout(captured):
+        coordinate(20, local=1, batch=10, seed=7, port=port, timeout=60)
+        print("after")
+    assert captured.getvalue() == "after\n"
+    with pytest.raises(OSError), socket.create_connection(("127.0.0.1", port), timeout=1):
+        pass
@@ -0,0 +1,41 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+The incremental history statistics match a rescan of every event.
+"""
+import random
+from event_history import EventHistory
+
+
+def test_statistics_match_rescan():
+    rng = random.Random(3)
+    keys = [n % 3 for n in range(13)]
+    history = EventHistory(size=10, numbers=13, keys=keys)
+    everything = []
+    for _ in range(500):
+        n = rng.randrange(13)
+        history.publish(n)
+        everything.append(n)
+        window = everything[-10:]
+        assert list(history) == window
+        assert [history[i] for i in range(-len(window), len(window))] == window * 2
+        assert [history.frequency(k) for k in range(13)] == [window.count(k) for k in range(13)]
+        for k in range(13):
+            expected = everything[::-1].index(k) if k in everything else len(everything)
+            assert history.sinceLast(k) == expected
+        run = 0
+        for e in reversed(everything):
+            if keys[e] != keys[n]:
+                break
+            run += 1
+        assert history.run(keys[n]) == run
+        assert all(history.run(k) == 0 for k in range(3) if k != keys[n])
+
+
+def test_clear():
+    history = EventHistory(size=4, numbers=38)
+    for n in (1, 2, 3, 4, 5):
+        history.publish(n)
+    history.clear()
+    assert len(history) == 0 and list(history) == []
+    assert history.sinceLast(5) == 0 and history.frequency(5) == 0
@@ -0,0 +1,47 @@
+"""
+Building Skills in Object-Oriented Design V4
+
+The incremental counts match a recount of the undealt cards.
+"""
+import random
+from collections import Counter
+from shoe_counter import CountingShoe, HI_LO, KO, OMEGA_II
+
+
+def test_counts_match_rescan():
+    shoe = CountingShoe(decks=6, rng=random.Random(1), systems=(HI_LO, KO, OMEGA_II))
+    shoe.shuffle()
+    dealt = []
+    for card in shoe:
+        dealt.append(card)
+        if len(dealt) % 37 == 0:
+            undealt = Counter(c.rank for c in shoe.cards[len(dealt):])
+            assert shoe.rankCounts[1:] == [undealt[r] for r in range(1, 14)]
+            assert shoe.remaining == len(shoe.cards) - len(dealt)
+            for system in shoe.systems:
+                expected = system.initialCount(6) + sum(system.tag(c) for c in dealt)
+                assert shoe.runningCount(system.name) == expected
+    assert 5 * 52 - 6 <= len(dealt) <= 5 * 52 + 6
+
+
+def test_balanced_count_ends_at_zero():
+    shoe = CountingShoe(decks=1, stopDeal=0, rng=random.Random(2), systems=(HI_LO, OMEGA_II))
+    shoe.shuffle()
+    for card in shoe:
+        pass
+    for card in shoe.cards[len(shoe.cards) - shoe.remaining:]:
+        shoe.dealt(card)
+    assert shoe.remaining == 0
+    assert shoe.counts() == {"Hi-Lo": 0, "Omega II": 0}
+    assert shoe.trueCount("Hi-Lo") == 0.0
+
+
+def test_second_pass_recounts():
+    shoe = CountingShoe(decks=1, rng=random.Random(3))
+    shoe.shuffle()
+    for _ in range(2):
+        dealt = [card for card in shoe]
+        assert shoe.remaining == len(shoe.cards) - len(dealt)
+        assert shoe.rankCounts[1:] == [
+            4 - sum(card.rank == rank for card in dealt) for rank in range(1, 14)
+        ]